@@ -51,6 +51,7 @@ setup(
     install_requires=[
         'redis==3.3.8',
         'apscheduler==3.6.1',
+        'futures==3.4.0',
         'MarkupSafe==1.1.1',
         'Jinja2==2.11.1',
         'Flask==1.1.1',
@@ -62,6 +63,9 @@ setup(
         'python-dotenv',
         'requests',
     ],
+    extras_require={
+        'binary': ['msgpack>=0.6'],
+    },
     classifiers=[
         'Intended Audience :: Alma Common Software users',
         'Operating System :: OS Independent',
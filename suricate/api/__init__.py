@@ -1,8 +1,8 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from redis import Redis
 from rq import Queue
 from suricate.api.config import api_config
+from suricate.redisdb import get_redis
 
 db = SQLAlchemy()
 
@@ -11,7 +11,7 @@ def create_app(config_name):
     app.config.from_object(api_config[config_name])
     api_config[config_name].init_app(app)
     db.init_app(app)
-    app.redis = Redis.from_url(app.config['REDIS_URL'])
+    app.redis = get_redis()
     app.task_queue = Queue(
         'discos-api',
         is_async=app.config['IS_ASYNC_QUEUE'],
@@ -11,7 +11,6 @@ class Config:
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     SURICATE_ADMIN = os.environ.get('SURICATE_ADMIN')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    REDIS_URL = 'redis://'
     TESTING = False
     IS_ASYNC_QUEUE = True
 
@@ -1,11 +1,14 @@
 from datetime import datetime
 from flask import current_app, jsonify
+from redis.exceptions import ResponseError
 from sqlalchemy import desc
 from suricate.api import db
 from suricate.api.main import main
 from suricate.api.tasks import command as task
 from suricate.models import Command, Attribute
+from suricate.monitor import history
 from suricate.configuration import dt_format
+from suricate.dbfiller import recent_values
 
 
 @main.route('/cmd/<command>', methods=['POST'])
@@ -125,8 +128,11 @@ def get_commands_from_datetimex_to_datetimey(dtx, dty):
 
 @main.route('/attr/<system>/<component>/<name>/<int:N>', methods=['GET'])
 def get_last_attribute_values(system, component, name, N):
-    """Returns the last N commands"""
+    """Returns the last N values"""
     key = '{}/{}/{}'.format(system, component, name)
+    values = recent_values(key, N)
+    if values is not None:
+        return jsonify(values)
     attrs = Attribute.query.filter(Attribute.name==key).\
                       order_by(desc(Attribute.timestamp)).\
                       limit(N).all()
@@ -198,3 +204,39 @@ def get_attribute_from_datetimex_to_datetimey(system, component, name, dtx, dty)
         return jsonify(response)
     else:
         return jsonify([a.serialize for a in attrs])
+
+
+@main.route('/attr/<system>/<component>/<name>/history/<int:N>', methods=['GET'])
+def get_attribute_history(system, component, name, N):
+    """Returns the last N samples of the Redis history, newest first"""
+    key = '{}/{}/{}'.format(system, component, name)
+    samples = history.read(key, count=N)
+    if not samples:
+        response = {
+            'status_code': 404,
+            'error_message': "empty attribute history"
+        }
+        return jsonify(response)
+    else:
+        return jsonify([dict(s, name=key) for s in samples])
+
+
+@main.route('/attr/<system>/<component>/<name>/history', methods=['GET'])
+def get_default_attribute_history(system, component, name):
+    """Returns all the samples of the Redis history, newest first"""
+    return get_attribute_history(system, component, name, None)
+
+
+@main.route('/attr/<system>/<component>/<name>/history/after/<last_id>', methods=['GET'])
+def get_attribute_history_after(system, component, name, last_id):
+    """Returns the samples added after the sample last_id, oldest first"""
+    key = '{}/{}/{}'.format(system, component, name)
+    try:
+        samples = history.read_after(key, last_id)
+    except ResponseError:
+        response = {
+            'status_code': 400,  # Bad request
+            'error_message': 'invalid sample id',
+        }
+        return jsonify(response)
+    return jsonify([dict(s, name=key) for s in samples])
@@ -0,0 +1,139 @@
+import os
+import zlib
+import logging
+import threading
+
+import suricate.services
+from suricate.configuration import config
+
+
+logger = logging.getLogger('suricate')
+
+
+class ClientPool(object):
+    """Share a few ACS clients among all the components.
+
+    The pool has `size` client slots, and a component always uses the
+    client of the slot given by the CRC32 of its name.  A client is
+    created when a component of its slot needs it, and it is discarded
+    when it loses the manager (i.e. after an ACS restart), so the next
+    component of the slot gets a new one.  The component references are
+    cached until invalidate() is called, usually because the reference
+    is broken.  The pool never force-releases a component, that would
+    deactivate it for all the other ACS clients too.
+    """
+
+    # Errors of a client that is no more connected to the manager
+    broken_client_errors = ('NoPermissionEx', 'COMM_FAILURE', 'TRANSIENT')
+
+    def __init__(self, size=1):
+        self.size = max(int(size), 1)
+        self.lock = threading.Lock()
+        self.slot_locks = [threading.Lock() for i in range(self.size)]
+        self.clients = [None] * self.size
+        self.references = {}  # Component name -> component reference
+        self.counters = {
+            'hits': 0,  # References taken from the cache
+            'misses': 0,  # References taken from the manager
+            'connections': 0,  # Clients created
+            'disconnections': 0,  # Clients discarded
+        }
+        self.pid = os.getpid()
+
+    def get_client(self, name):
+        """Return the client of the component `name`, creating it lazily."""
+        index = self.slot(name)
+        with self.slot_locks[index]:
+            client = self.clients[index]
+            if client is None:
+                Client = suricate.services.get_client_class()
+                client = self.clients[index] = Client('suricate-%d' % index)
+                self._count('connections')
+        return client
+
+    def get_component(self, name):
+        """Return the reference of component `name`."""
+        reference = self.references.get(name)
+        if reference is not None:
+            self._count('hits')
+            return reference
+        client = self.get_client(name)
+        try:
+            reference = client.getComponent(name)
+        except Exception, ex:
+            ex_name = ex.__class__.__name__
+            if any(error in ex_name for error in self.broken_client_errors):
+                self.discard(self.slot(name), client)
+            raise
+        self._count('misses')
+        if reference is not None:
+            self.references[name] = reference
+        return reference
+
+    def invalidate(self, name):
+        """Forget the cached reference of component `name`, so the next
+        get_component() asks the manager for it again."""
+        self.references.pop(name, None)
+
+    def release(self, name):
+        """Forget the reference of component `name` and release it."""
+        if self.references.pop(name, None) is None:
+            return
+        client = self.clients[self.slot(name)]
+        if client is not None:
+            try:
+                client.releaseComponent(name)
+            except Exception, ex:
+                logger.debug('cannot release %s: %s' % (name, ex))
+
+    def discard(self, index, client):
+        """Disconnect the `client` of slot `index`, if still in the slot."""
+        with self.slot_locks[index]:
+            if self.clients[index] is not client:
+                return  # Already discarded
+            self.clients[index] = None
+        self._count('disconnections')
+        for name in list(self.references):
+            if self.slot(name) == index:
+                self.references.pop(name, None)
+        try:
+            client.disconnect()
+        except Exception, ex:
+            logger.debug('cannot disconnect ACS client %d: %s' % (index, ex))
+
+    def slot(self, name):
+        return (zlib.crc32(name) & 0xffffffff) % self.size
+
+    def stats(self):
+        """Return the size, the connected clients, the cached references
+        and the counters of the pool."""
+        with self.lock:
+            result = dict(self.counters)
+        result.update({
+            'size': self.size,
+            'clients': sum(1 for client in self.clients if client is not None),
+            'references': len(self.references),
+        })
+        return result
+
+    def _count(self, counter):
+        with self.lock:
+            self.counters[counter] += 1
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the ClientPool of this process.
+
+    The size of the pool is config['SCHEDULER']['acs_clients'].  A
+    forked process does not share the clients of its parent, and it gets
+    a new pool.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.pid != os.getpid():
+            _pool = ClientPool(config['SCHEDULER'].get('acs_clients', 1))
+        return _pool
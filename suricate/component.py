@@ -1,11 +1,11 @@
-import redis
 import suricate.services
-from datetime import datetime, timedelta
+from suricate.clients import get_pool
 from suricate.errors import CannotGetComponentError
-from suricate.configuration import dt_format
+from suricate.monitor.states import states
+from suricate.redisdb import get_redis
 
 
-r = redis.StrictRedis()
+r = get_redis()
 # Remove old status keys from the DB
 for key in r.scan_iter("*"):
     if key.startswith('__'):
@@ -25,6 +25,7 @@ class Proxy(object):
         try:
             return self._attr(*args, **kwargs)
         except Exception:
+            get_pool().invalidate(self._comp_name)
             raise CannotGetComponentError(
                 'broken reference to %s' % self._comp_name)
 
@@ -33,7 +34,6 @@ class Component(object):
     """Delegate the attribute access to an ACS component"""
 
     unavailables = []  # Unavailable components
-    clients = {}
 
     def __init__(self, name, container, startup_delay=0):
         self.name = str(name)
@@ -45,20 +45,12 @@ class Component(object):
         if name in self.unavailables:
             raise CannotGetComponentError('component %s not available' % name)
         try:
-            with suricate.services.logging_lock:
-                self.release()
+            with states.lock(self.name):
                 if not suricate.services.is_container_online(self.container):
                     raise CannotGetComponentError('%s not running' % self.name)
                 else:
-                    Client = suricate.services.get_client_class()
-                    client = Client(self.name)
-                    Component.clients[self.name] = client
-                    self._component = Component.clients[self.name].getComponent(self.name)
-                    startup_time = datetime.utcnow() + timedelta(seconds=startup_delay)
-                    r.set(
-                        '__%s/startup_time' % self.name,
-                        startup_time.strftime(dt_format),
-                    )
+                    self._component = get_pool().get_component(self.name)
+                    states.start(self.name, startup_delay)
         except Exception, ex:
             # I check the name of the class because I can not catch the
             # proper exception. Actually I can not catch it when executing
@@ -94,8 +86,39 @@ class Component(object):
         attr = self.__dict__.get(name) or getattr(self._component, name)
         return Proxy(attr, self.name)
 
+    def monitor(self, attribute, callback, timer, delta=None):
+        """Create a BACI monitor of the `attribute` property.
+
+        The monitor calls `callback(value, timestamp)` every `timer`
+        seconds and, in case of `delta`, when the value changes more
+        than `delta`.  The caller has to destroy() the returned monitor.
+        """
+        import ACS
+        import ACS__POA
+        property_obj = getattr(self._component, '_get_' + attribute)()
+        # I.e. IDL:alma/ACS/ROdoubleSeq:1.0 -> CBdoubleSeq
+        type_name = property_obj._NP_RepositoryId.split('/')[-1].split(':')[0]
+        CBClass = getattr(ACS__POA, 'CB' + type_name[2:])
+
+        class Callback(CBClass):
+
+            def working(self, value, completion, desc):
+                callback(value, completion.timeStamp)
+
+            def done(self, value, completion, desc):
+                pass
+
+            def negotiate(self, time_to_transmit, desc):
+                return True
+
+        client = get_pool().get_client(self.name)
+        cb = client.activateOffShoot(Callback())
+        desc = ACS.CBDescIn(0L, 0L, 0L)
+        monitor = property_obj.create_monitor(cb, desc)
+        monitor.set_timer_trigger(long(timer * 10**7))  # 100ns units
+        if delta is not None:
+            monitor.set_value_trigger(delta, True)
+        return monitor
+
     def release(self):
-        client = Component.clients.pop(self.name, None)
-        if client:
-            client.forceReleaseComponent(self.name)
-            client.disconnect()
+        get_pool().release(self.name)
@@ -40,7 +40,25 @@ default_config = {
     'SCHEDULER': {
         'reschedule_interval': 1,  # Seconds
         'reschedule_error_interval': 2,  # Seconds
+        'reschedule_error_max_interval': 4,  # Seconds, backoff of the probes
+        'reschedule_error_jitter': 0.2,  # Random fraction of the probe delays
         'dbfiller_cycle': 1, # Seconds
+        'recent_values': 100,  # Last values of an attribute kept in Redis
+        'engine': 'background',  # background, timing_wheel or bounded
+        'workers': 1,  # Publisher processes, or 'auto' (one per CPU core)
+        'worker_timeout': 60,  # Seconds to wait for the answer of a worker
+        'sharding': 'container',  # container or hash
+        'phase_spreading': True,  # Spread the jobs inside their periods
+        'wire_format': 'json',  # json, binary or json+binary
+        'read_timeout': 5,  # Seconds, unless the attribute sets its timeout
+        'read_pool_size': 20,  # Threads reading the attributes
+        'component_max_reads': 4,  # Running reads of a component
+        'acs_clients': 1,  # ACS clients shared by the components
+        'connect_pool_size': 8,  # Threads connecting the components
+        'probe_ttl': 1,  # Seconds a snapshot of the process table is valid
+        'health_period': 1,  # Seconds between two checks of the manager
+        'history_maxlen': 0,  # Samples in the history of an attribute, 0: off
+        'history_max_age': None,  # Seconds, in place of history_maxlen
     },
 
     'HTTP': {
@@ -48,6 +66,16 @@ default_config = {
         'baseurl': 'http://127.0.0.1',  # Web app URL
     },
 
+    'REDIS': {
+        'host': 'localhost',
+        'port': 6379,
+        'db': 0,
+        'unix_socket_path': None,  # Used in place of host and port
+        'socket_timeout': None,  # Seconds, None to wait forever
+        'socket_connect_timeout': None,  # Seconds
+        'pool_size': 50,  # Connections shared by all the modules
+    },
+
     'DATABASE': 'testing',
 
     'RUN_ON_MANAGER_HOST': True,
@@ -1,9 +1,9 @@
+import json
 import time
 import logging
 from datetime import datetime
 from multiprocessing import Process
 
-import redis
 import sqlalchemy as db
 
 from sqlalchemy.orm import sessionmaker
@@ -11,10 +11,11 @@ from sqlalchemy.exc import IntegrityError
 from suricate.models import Attribute
 from suricate.api.config import api_config
 from suricate.configuration import config, dt_format
+from suricate.redisdb import attributes_key, get_redis
 
 
 logger = logging.getLogger('suricate')
-r = redis.StrictRedis()
+r = get_redis()
 
 stop_key = '__dbfiller_stop'
 
@@ -24,7 +25,11 @@ class DBFiller(object):
         r.set('__dbfiller_stop', 'no')
 
     def dbfiller(self):
-        """Get all keys from redis and look for the attributes."""
+        """Store the attributes published on redis.
+
+        The publisher adds the attribute keys to the `attributes_key` set,
+        and every cycle all their hashes are read in a single pipeline.
+        """
         db_config = config['DATABASE']
         configuration_class = api_config[db_config]
         db_uri = configuration_class.SQLALCHEMY_DATABASE_URI
@@ -33,7 +38,8 @@ class DBFiller(object):
         Session = sessionmaker(bind=engine)
 
         while True:
-            for key in r.scan_iter("*"):
+            keys = []
+            for key in r.smembers(attributes_key):
                 if key.startswith('_'):
                     continue
                 elif ':' in key or 'healthy_job' in key:
@@ -43,25 +49,29 @@ class DBFiller(object):
                     # I.e. ANTENNA/Boss/rawAzimuth
                     continue
                 else:
-                    data = r.hgetall(key)
-                    if  not isinstance(data, dict) and 'error' not in data:
-                        continue
-                    if 'timestamp' not in data:
-                        continue
-                    if data['error']:
-                        continue  # Do not store error messages
-    
+                    keys.append(key)
+            pipe = r.pipeline()
+            for key in keys:
+                pipe.hgetall(key)
+            recent = r.pipeline()
+            for key, data in zip(keys, pipe.execute(raise_on_error=False)):
+                if not isinstance(data, dict) or 'timestamp' not in data:
+                    continue
+                if data.get('error'):
+                    continue  # Do not store error messages
+
                 timestamp = datetime.strptime(data['timestamp'], dt_format)
-                attr = Attribute(
+                sample = dict(
                     id='{} @ {}'.format(key, data['timestamp']),
                     name=key,
                     units=data['units'],
-                    timestamp=timestamp,
-                    timer=data['timer'],
+                    timestamp=timestamp.strftime(dt_format),
+                    timer=float(data['timer']),
                     description=data['description'],
                     value=data['value'],
                     error=data['error'],
                 )
+                attr = Attribute(**dict(sample, timestamp=timestamp))
                 try:
                     session = Session()
                     session.add(attr)
@@ -70,7 +80,9 @@ class DBFiller(object):
                     continue
                 finally:
                     session.close()
+                remember(recent, sample)
 
+            recent.execute()
             time.sleep(config['SCHEDULER']['dbfiller_cycle'])
             if r.get('__dbfiller_stop') == 'yes':
                 break
@@ -83,3 +95,29 @@ class DBFiller(object):
 
     def shutdown(self):
         r.set('__dbfiller_stop', 'yes')
+
+
+def recent_key(name):
+    """Return the key of the last values of attribute `name`."""
+    return '%s:recent' % name
+
+
+def remember(pipe, sample):
+    """Queue on `pipe` the push of a stored `sample` to the list of the
+    last config['SCHEDULER']['recent_values'] values of its attribute."""
+    size = config['SCHEDULER'].get('recent_values', 100)
+    key = recent_key(sample['name'])
+    pipe.lpush(key, json.dumps(sample))
+    pipe.ltrim(key, 0, size - 1)
+
+
+def recent_values(name, N):
+    """Return the last N values of attribute `name` stored in the database,
+    newest first, without querying it.  Return None in case the list of
+    the last values does not have N of them yet."""
+    if not 0 < N <= config['SCHEDULER'].get('recent_values', 100):
+        return None
+    items = r.lrange(recent_key(name), 0, N - 1)
+    if len(items) < N:
+        return None
+    return [json.loads(item) for item in items]
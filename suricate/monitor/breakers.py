@@ -0,0 +1,118 @@
+import random
+import threading
+
+from suricate.configuration import config
+from suricate.monitor.states import monotonic
+
+
+def backoff(failures):
+    """Return the seconds to wait for a retry after `failures` failures.
+
+    The first retry waits the scheduler `reschedule_error_interval`, and
+    every failure doubles the delay, up to `reschedule_error_max_interval`.
+    The delays have a random `reschedule_error_jitter`, so the failures
+    that happened together do not retry together.
+    """
+    scheduler = config['SCHEDULER']
+    base = scheduler['reschedule_error_interval']
+    maximum = scheduler.get('reschedule_error_max_interval', 60)
+    jitter = scheduler.get('reschedule_error_jitter', 0.2)
+    delay = min(base * 2 ** failures, max(base, maximum))
+    return delay * random.uniform(1 - jitter, 1 + jitter)
+
+
+class CircuitBreaker(object):
+    """The open circuit of a component that can not be sampled.
+
+    While the circuit is open, the `jobs` of the component are paused,
+    and a single probe job tries to get the component again after an
+    exponential backoff (see backoff()).
+    """
+
+    def __init__(self, component):
+        self.component = component
+        self.jobs = set()  # Identifiers of the paused jobs
+        self.failures = 0  # Failed probes
+
+    def delay(self):
+        """Return the seconds to wait before the next probe."""
+        return backoff(self.failures)
+
+
+class Breakers(object):
+    """The open circuits, by component name."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.circuits = {}  # Component name -> CircuitBreaker
+
+    def open(self, component, job_ids):
+        """Add `job_ids` to the circuit of `component`, opening it if
+        it is closed.  Return the circuit, the jobs not already in it and
+        True if the circuit has just been opened."""
+        with self.lock:
+            circuit = self.circuits.get(component.name)
+            opened = circuit is None
+            if opened:
+                circuit = self.circuits[component.name] = CircuitBreaker(component)
+            new_jobs = [job_id for job_id in job_ids if job_id not in circuit.jobs]
+            circuit.jobs.update(new_jobs)
+        return circuit, new_jobs, opened
+
+    def close(self, name):
+        """Remove and return the circuit of component `name`."""
+        with self.lock:
+            return self.circuits.pop(name, None)
+
+    def get(self, name):
+        return self.circuits.get(name)
+
+    def clear(self):
+        with self.lock:
+            self.circuits.clear()
+
+
+breakers = Breakers()
+
+
+class Throttles(object):
+    """The attributes that failed, by channel.
+
+    An attribute that can not be read (i.e. a read timeout) does not
+    open the circuit of its component, whose other attributes are fine.
+    It is not read again until its backoff() has elapsed, and in the
+    meantime its samples keep the error.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.channels = {}  # Channel -> (failures, retry time, error)
+
+    def failed(self, channel, error):
+        """Record the `error` of `channel`, and delay its next read."""
+        with self.lock:
+            failures = self.channels.get(channel, (0,))[0]
+            retry = monotonic() + backoff(failures)
+            self.channels[channel] = (failures + 1, retry, error)
+
+    def succeeded(self, channel):
+        with self.lock:
+            self.channels.pop(channel, None)
+
+    def error(self, channel):
+        """Return the error of `channel` if it has not to be read yet,
+        otherwise an empty string."""
+        failures, retry, error = self.channels.get(channel, (0, 0, ''))
+        return error if monotonic() < retry else ''
+
+    def remove(self, channels):
+        with self.lock:
+            for channel in channels:
+                self.channels.pop(channel, None)
+
+    def clear(self):
+        with self.lock:
+            self.channels.clear()
+
+
+throttles = Throttles()
@@ -1,39 +1,109 @@
 import sys
+import time
 import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from os.path import join
 
-import redis
-import json
 from apscheduler import events
-
-from suricate.monitor.schedulers import Scheduler
-from suricate.configuration import config, dt_format
-from suricate.errors import (
-    CannotGetComponentError,
-    ComponentAttributeError,
-    ACSNotRunningError,
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.util import utc_timestamp_to_datetime
+
+from suricate.monitor.schedulers import (
+    Scheduler,
+    attribute_ids,
+    batch_publisher,
+    get_component_name,
 )
+from suricate.monitor.jobs import forget, last_samples, publish, register
+from suricate.monitor import history
+from suricate.monitor.breakers import breakers, throttles
+from suricate.monitor.push import PushPublisher
+from suricate.monitor.states import states
+from suricate.monitor.stats import stats
+from suricate.configuration import config, dt_format
+from suricate.errors import CannotGetComponentError, ACSNotRunningError
 import suricate.services
+from suricate import wire
+from suricate.clients import get_pool
+from suricate.dbfiller import recent_key
+from suricate.redisdb import attributes_key, get_redis
 
 logger = logging.getLogger('suricate')
-r = redis.StrictRedis()
+r = get_redis()
+
+
+def get_options(attribute):
+    """Return the optional settings of an attribute configuration.
+
+    The options are all the keys but name, timer, units and description,
+    i.e. mode, deadband, deadband_type, heartbeat and typed.
+    """
+    return dict(
+        (key, value) for key, value in attribute.items()
+        if key not in ('name', 'timer', 'units', 'description')
+    )
+
+
+def get_connect_pool_size(components):
+    """Return the number of threads connecting `components` components."""
+    size = config['SCHEDULER'].get('connect_pool_size', 8)
+    return max(min(components, size), 1)
+
+
+def get_attributes(targets):
+    """Return the properties and the methods of a component configuration."""
+    return targets.get('properties', []) + targets.get('methods', [])
+
+
+def check_components(components):
+    """Raise ValueError in case of an invalid COMPONENTS configuration."""
+    for component_name, targets in components.items():
+        startup_delay = targets.get('startup_delay')
+        if startup_delay is None:
+            raise ValueError('no startup_delay specified for %s' % component_name)
+        try:
+            int(startup_delay)
+        except ValueError:
+            raise ValueError('cannot convert startup_delay %ss to int' % startup_delay)
+        if targets.get('container') is None:
+            raise ValueError('no container specified for %s' % component_name)
 
 
 class Publisher(object):
 
     s = Scheduler()
+    pushers = {}  # Channel -> PushPublisher of the push mode attributes
 
-    def __init__(self, *args):
+    def __init__(self, *args, **kwargs):
         self.unavailable_components = {}
-        r.delete('components')
+        # The reloads and the rescheduler change the jobs one at a time
+        self.lock = threading.RLock()
+        # A shared publisher is one of many publisher processes, and
+        # it must not clear the statuses of the other components
+        if not kwargs.get('shared', False):
+            r.delete('components')
+            states.clear()
+            last_samples.clear()
+            stats.clear()
+            breakers.clear()
+            throttles.clear()
         if len(args) == 0:
             pass
         elif len(args) == 1:  # The argument must be a dictionary (JSON format)
-           self.add_jobs(*args)
+            start = time.time()
+            self.add_jobs(*args)
+            logger.info('startup: %d components connected in %.2f seconds' % (
+                len(args[0]) - len(self.unavailable_components),
+                time.time() - start))
         else:
             logger.error('Publisher takes 0 or 1 argument, %d given' % len(args))
 
+        wire_format = config['SCHEDULER'].get('wire_format', 'json')
+        if wire_format != 'json' and wire.msgpack is None:
+            logger.error('msgpack not installed: cannot publish %s' % wire_format)
         Publisher.add_errors_listener()
         self.s.add_job(
             func=self.rescheduler,
@@ -68,158 +138,368 @@ class Publisher(object):
             }
         }
         """
-        # list of tuples [(component, attribute_name, timer, units, description), ...]
-        pjobs_args = []  # Properties list
-        mjobs_args = []  # Methods list
-        import suricate.component
+        try:
+            check_components(config)
+        except ValueError, ex:
+            logger.error(str(ex))
+            sys.exit(0)
+        with self.lock:
+            self._add_jobs(config)
+
+    def _add_jobs(self, config):
+        # Connect the components concurrently, and add the attributes of
+        # every component as soon as it is connected
+        futures = {}
+        executor = ThreadPoolExecutor(get_connect_pool_size(len(config)))
         for component_name, targets in config.items():
-            # Set the default redis values
-            properties = targets.get('properties', [])
-            methods = targets.get('methods', [])
-            startup_delay = targets.get('startup_delay')
-            if startup_delay is None:
-                logger.error('no startup_delay specified for %s' % component_name)
-                sys.exit(0)
-            try:
-                startup_delay = int(startup_delay)
-            except ValueError:
-                logger.error('cannot convert startup_delay %ss to int' % startup_delay)
-                sys.exit(0)
-            container_name = targets.get('container')
-            if container_name is None:
-                logger.error('no container specified for %s' % component_name)
-                sys.exit(0)
-            try:
-                if not suricate.services.is_manager_online():
-                    r.hmset('components', {component_name: 'unavailable'})
-                    key = '__manager/error'
-                    error_message = 'ACS not running'
-                else:
-                    key = '__%s/error' % component_name
-                    error_message = 'cannot get component %s' % component_name
-
-                c = suricate.component.Component(
-                        component_name,
-                        container_name,
-                        startup_delay
-                )
-                # Remove the component from the unavailable dictionary
-                self.unavailable_components.pop(component_name, None)
-                r.delete('__manager/error')
-                r.delete('__%s/error' % component_name)
-            except CannotGetComponentError:
+            future = executor.submit(
+                self._connect,
+                component_name,
+                targets['container'],
+                int(targets['startup_delay'])
+            )
+            futures[future] = (component_name, targets)
+        executor.shutdown(wait=False)
+        for future in as_completed(futures):
+            component_name, targets = futures[future]
+            c, error_message = future.result()
+            if c is None:
                 self.unavailable_components[component_name] = targets
-                with suricate.services.logging_lock:
-                    if r.get(key) != error_message:
-                        logger.error(error_message)
-                    r.set(key, error_message)
-
-            for prop in properties:
-                attr_name = prop['name']
-                timer = prop['timer']
-                units = prop.get('units', '')
-                description = prop.get('description', '')
-                if component_name in self.unavailable_components:
+                for attribute in get_attributes(targets):
                     self._set_attr_error(
                         component_name,
-                        attr_name,
-                        timer,
-                        units,
-                        description,
-                        error_message
+                        attribute['name'],
+                        attribute['timer'],
+                        attribute.get('units', ''),
+                        attribute.get('description', ''),
+                        error_message,
+                        get_options(attribute)
                     )
-                else:
-                    if hasattr(c, '_get_%s' % attr_name):
-                        pjobs_args.append((
-                            c,
+                continue
+
+            # Remove the component from the unavailable dictionary
+            self.unavailable_components.pop(component_name, None)
+            batches, push_args = self.get_batches(c, targets)
+            for timer, attributes in batches.items():
+                self.s.add_component_job(
+                    c,
+                    attributes,
+                    timer,
+                    targets.get('phase_group')
+                )
+
+            for args in push_args:
+                self.add_monitor(*args)
+
+    @staticmethod
+    def get_batches(component, targets):
+        """Return the batches and the push mode attributes of `component`.
+
+        The batches are a {timer: [(attribute, units, description,
+        options), ...]} dictionary, because the attributes of a component
+        sharing the same timer are sampled together by a single job.  The
+        push mode attributes are the list of add_monitor() arguments.  The
+        attributes the component has not are logged and skipped.
+        """
+        batches = OrderedDict()
+        push_args = []
+        for kind in ('properties', 'methods'):
+            for attribute in targets.get(kind, []):
+                attr_name = attribute['name']
+                timer = attribute['timer']
+                units = attribute.get('units', '')
+                description = attribute.get('description', '')
+                options = get_options(attribute)
+                if kind == 'properties':
+                    if not hasattr(component, '_get_%s' % attr_name):
+                        logger.error('%s has not property %s' % (component.name, attr_name))
+                        continue
+                    if options.get('mode') == 'push':
+                        push_args.append((
+                            component,
                             attr_name,
                             timer,
                             units,
-                            description
+                            description,
+                            options
                         ))
-                    else:
-                        logger.error('%s has not property %s' % (c.name, attr_name))
-
-            for method in methods:
-                attr_name = method['name']
-                timer = method['timer']
-                units = method.get('units', '')
-                description = method.get('description', '')
-                if component_name in self.unavailable_components:
-                    self._set_attr_error(
-                        component_name,
-                        attr_name,
-                        timer,
-                        units,
-                        description,
-                        error_message
-                    )
+                        continue
+                elif not hasattr(component, attr_name):
+                    logger.error('%s has not method %s' % (component.name, attr_name))
+                    continue
+                attributes = batches.setdefault(timer, [])
+                attributes.append((attr_name, units, description, options))
+        return batches, push_args
+
+    @staticmethod
+    def _connect(component_name, container_name, startup_delay):
+        """Return the Component and the error message, or None and the
+        error message in case the component is not available."""
+        import suricate.component
+        if not suricate.services.is_manager_online():
+            states.set_available(component_name, False)
+            key = '__manager/error'
+            error_message = 'ACS not running'
+        else:
+            key = '__%s/error' % component_name
+            error_message = 'cannot get component %s' % component_name
+        try:
+            c = suricate.component.Component(
+                    component_name,
+                    container_name,
+                    startup_delay
+            )
+            states.clear_message('__manager/error')
+            states.clear_message('__%s/error' % component_name)
+            return c, error_message
+        except CannotGetComponentError:
+            states.set_available(component_name, False)
+            if states.set_message(key, error_message):
+                logger.error(error_message)
+            return None, error_message
+
+    def add_monitor(self, component, attribute, timer, units, description, options):
+        """Publish the `attribute` property by means of its monitor."""
+        pusher = PushPublisher(
+            component,
+            attribute,
+            timer,
+            units,
+            description,
+            options
+        )
+        old_pusher = self.pushers.pop(pusher.channel, None)
+        if old_pusher:
+            old_pusher.stop()
+        self.pushers[pusher.channel] = pusher
+        register([pusher.channel])
+        try:
+            pusher.start()
+        except Exception, ex:  # The rescheduler will restart it
+            logger.error('cannot monitor %s: %s' % (pusher.channel, ex))
+
+
+    def reload(self, components):
+        """Apply a new COMPONENTS configuration to the running jobs.
+
+        The configuration is compared with the running jobs, and only the
+        jobs of the attributes that changed are added, removed or
+        modified.  The other jobs keep running with the same component
+        references and Redis keys, so the reload makes no sampling gap.
+        Return the channels of the added, removed and modified attributes.
+        """
+        check_components(components)
+        with self.lock:
+            return self._reload(components)
+
+    def _reload(self, components):
+        changes = {'added': [], 'removed': [], 'modified': []}
+        running = self.running_components()
+        for name in set(running) | set(self.unavailable_components):
+            if name not in components:
+                self.remove_component(name, running.get(name), changes)
+
+        new_components = {}
+        for name, targets in components.items():
+            if name in self.unavailable_components:
+                # The rescheduler will add the jobs
+                self.unavailable_components[name] = targets
+            elif name not in running:
+                new_components[name] = targets
+            else:
+                component, jobs, pushers = running[name]
+                if (component.container != str(targets['container']) or
+                        component.startup_delay != int(targets['startup_delay'])):
+                    # Get the component again, from the new container
+                    self.remove_component(name, running[name], changes)
+                    new_components[name] = targets
                 else:
-                    if hasattr(c, attr_name):
-                        mjobs_args.append((
-                            c,
-                            attr_name,
-                            timer,
-                            units,
-                            description
-                        ))
-                    else:
-                        logger.error('%s has not method %s' % (c.name, attr_name))
+                    self.reload_component(component, targets, jobs, pushers, changes)
+
+        if new_components:
+            self.add_jobs(new_components)
+            for name, targets in new_components.items():
+                for attribute in get_attributes(targets):
+                    changes['added'].append('%s/%s' % (name, attribute['name']))
+        return changes
+
+    def running_components(self):
+        """Return the components that have jobs or monitors, as a
+        {name: (component, {timer: job}, {channel: pusher})} dictionary."""
+        running = {}
+        for job in self.s.get_jobs():
+            if job.func is batch_publisher:
+                component = job.args[1]
+                _, jobs, _ = running.setdefault(component.name, (component, {}, {}))
+                jobs[job.args[3]] = job
+        for channel, pusher in self.pushers.items():
+            component = pusher.component
+            _, _, pushers = running.setdefault(component.name, (component, {}, {}))
+            pushers[channel] = pusher
+        return running
+
+    def reload_component(self, component, targets, jobs, pushers, changes):
+        """Change the `jobs` and `pushers` of a running component, in
+        order to sample the attributes of its new `targets`."""
+        name = component.name
+        batches, push_args = self.get_batches(component, targets)
+        old = {}  # Channel -> (timer or 'push', sampling arguments)
+        for timer, job in jobs.items():
+            for item in job.args[2]:
+                old[item[0]] = (timer, item)
+        for channel, pusher in pushers.items():
+            old[channel] = ('push', (
+                pusher.timer, pusher.units, pusher.description, pusher.options))
+        new = {}
+        for timer, attributes in batches.items():
+            batch = []
+            for attr_name, units, description, options in attributes:
+                channel = '%s/%s' % (name, attr_name)
+                item = (channel, attr_name, units, description, options)
+                batch.append(item)
+                new[channel] = (timer, item)
+            batches[timer] = batch
+        for args in push_args:
+            new['%s/%s' % (name, args[1])] = ('push', tuple(args[2:]))
+
+        phase_group = targets.get('phase_group')
+        for timer, job in jobs.items():
+            if timer not in batches:
+                try:
+                    self.s.remove_job(job.id)
+                except JobLookupError:
+                    pass
+                continue
+            if batches[timer] != list(job.args[2]):
+                self.s.modify_job(job.id, args=(job.id, job.args[1], batches[timer], timer))
+            if self.s.phase_groups.get(job.id) != phase_group:
+                if phase_group:
+                    self.s.phase_groups[job.id] = phase_group
+                else:
+                    self.s.phase_groups.pop(job.id, None)
+                if job.next_run_time is not None:  # Not paused
+                    self.s.reschedule_job(job.id, trigger='interval', seconds=timer)
+        for timer, batch in batches.items():
+            if timer not in jobs:
+                attributes = [item[1:] for item in batch]
+                self.s.add_component_job(component, attributes, timer, phase_group)
+        for channel, pusher in pushers.items():
+            if new.get(channel, (None,))[0] != 'push':
+                pusher.stop()
+                self.pushers.pop(channel, None)
+        for args in push_args:
+            channel = '%s/%s' % (name, args[1])
+            if old.get(channel) != new[channel]:
+                self.add_monitor(*args)
+
+        removed = []
+        for channel in sorted(set(old) | set(new)):
+            if channel not in new:
+                changes['removed'].append(channel)
+                removed.append(channel)
+            elif channel not in old:
+                changes['added'].append(channel)
+            elif old[channel] != new[channel]:
+                changes['modified'].append(channel)
+            else:
+                continue
+            forget([(channel,)])
+        self.remove_channels(removed)
+
+    def remove_component(self, name, running=None, changes=None):
+        """Stop sampling the component `name`, removing its Redis keys.
 
-        for arg in pjobs_args:
-            self.s.add_attribute_job(*arg)
+        The `running` argument is the item of running_components().
+        """
+        with self.lock:
+            self._remove_component(name, running, changes)
+
+    def _remove_component(self, name, running=None, changes=None):
+        channels = []
+        targets = self.unavailable_components.pop(name, None)
+        if targets:
+            channels = ['%s/%s' % (name, a['name']) for a in get_attributes(targets)]
+        if running:
+            component, jobs, pushers = running
+            for job in jobs.values():
+                channels.extend(item[0] for item in job.args[2])
+                try:
+                    self.s.remove_job(job.id)
+                except JobLookupError:
+                    pass
+            for channel, pusher in pushers.items():
+                channels.append(channel)
+                pusher.stop()
+                self.pushers.pop(channel, None)
+        if breakers.close(name):
+            try:
+                self.s.remove_job('probe:%s' % name)
+            except JobLookupError:
+                pass
+        states.remove(name)
+        self.remove_channels(channels)
+        if changes is not None:
+            changes['removed'].extend(channels)
 
-        for met in mjobs_args:
-            self.s.add_attribute_job(*met)
+    @staticmethod
+    def remove_channels(channels):
+        """Forget the removed `channels`, deleting their Redis keys."""
+        if not channels:
+            return
+        forget([(channel,) for channel in channels])
+        stats.remove(channels)
+        throttles.remove(channels)
+        keys = list(channels)
+        keys += [history.history_key(channel) for channel in channels]
+        keys += [recent_key(channel) for channel in channels]
+        pipe = r.pipeline()
+        pipe.delete(*keys)
+        pipe.srem(attributes_key, *channels)
+        pipe.execute()
 
 
     def rescheduler(self):
-        # Check if unavailable components are now available
-        for comp, status in r.hgetall('components').items():
-            if status == 'available':
-                self.unavailable_components.pop(comp, None)
-
-        self.add_jobs(self.unavailable_components)
-
-        scheduled_comps = set()
-        # Reschedule old jobs currently unavailable
-        for job in self.get_jobs():
-            if job.id.count('/') == 2:
-                component_name = '/'.join(job.id.split('/')[:2])
-                scheduled_comps.add(component_name)
-            error_job_key = 'error_job:%s' % job.id
-            healthy_job_key = 'healthy_job:%s' % job.id
-            interval_time = r.get(error_job_key)
-            if interval_time and r.get(healthy_job_key):
-                r.delete(error_job_key)
-                self.s.reschedule_job(
-                    job.id,
-                    trigger='interval',
-                    seconds=float(interval_time)
-                )
+        with self.lock:
+            # Check if unavailable components are now available
+            for comp in list(self.unavailable_components):
+                if states.is_available(comp):
+                    self.unavailable_components.pop(comp, None)
 
-        # Create a set of unavailable components
-        unavailable_comps = set()
-        for comp in self.unavailable_components:
-            unavailable_comps.add(comp)
-        for comp, status in r.hgetall('components').items():
-            if status == 'unavailable':
-                unavailable_comps.add(comp)
-            elif comp in unavailable_comps:
-                unavailable_comps.remove(comp)
-                
-
-        all_comps = unavailable_comps | scheduled_comps
-        for comp in all_comps:
-            if comp in unavailable_comps:
-                r.hmset('components', {comp: 'unavailable'})
-            else:
-                r.hmset('components', {comp: 'available'})
+            self.add_jobs(self.unavailable_components)
+
+        # Restart the monitors that stopped pushing the values
+        for pusher in self.pushers.values():
+            if not pusher.is_alive():
+                pusher.restart()
+
+        # Register the channels again, in case Redis lost them
+        register([job['id'] for job in self.attribute_jobs()])
 
 
     def get_jobs(self):
         return self.s.get_jobs()
 
+    def attribute_jobs(self):
+        """Return the identifier and timer of every scheduled attribute."""
+        jobs = []
+        for j in self.s.get_jobs():
+            if get_component_name(j) is None:
+                continue  # The rescheduler and the probes
+            sec, mic = j.trigger.interval.seconds, j.trigger.interval.microseconds
+            for job_id in attribute_ids(j):
+                jobs.append({'id': job_id, 'timer': sec + mic / (1.0 * 10 ** 6)})
+        for channel, pusher in self.pushers.items():
+            jobs.append({'id': channel, 'timer': pusher.timer})
+        return jobs
+
+
+    def stats(self):
+        """Return the sampling statistics (see SamplingStats.dump())."""
+        return stats.dump()
+
+    def clients(self):
+        """Return the statistics of the ACS client pool."""
+        return get_pool().stats()
 
     @classmethod
     def add_errors_listener(cls):
@@ -229,69 +509,117 @@ class Publisher(object):
     @staticmethod
     def errors_listener(event):
         job_id = event.job_id
-        healthy_job_key = 'healthy_job:%s' % job_id
-        r.delete(healthy_job_key)
-        if isinstance(
-                event.exception,
-                (CannotGetComponentError, ComponentAttributeError, ACSNotRunningError)):
+        # The attribute errors do not get here: the job publishes them
+        # and throttles the failing attributes, without stopping the others
+        if isinstance(event.exception, (CannotGetComponentError, ACSNotRunningError)):
             job = Publisher.s.get_job(job_id)
-            error_job_key = 'error_job:%s' % job_id
-            if not r.get(error_job_key) and job:
-                # Save job.seconds, because we will temporarily change it
-                sec, mic = job.trigger.interval.seconds, job.trigger.interval.microseconds
-                interval = sec + mic / (1.0 * 10 ** 6)
-                if not r.set(error_job_key, interval):
-                    logger.error('cannot set %s' % error_job_key)
-                # Slowdown the job, until the component comes available
-                Publisher.s.reschedule_job(
-                    job_id,
-                    trigger='interval',
-                    seconds=config['SCHEDULER']['reschedule_error_interval']
-                )
-
-            if not hasattr(job, 'args'):
+            if not job or get_component_name(job) is None:
                 return
-
-            channel, old_component_ref, attribute, timer, units, description  = job.args
-            import suricate.component
-            # If the component is available, we pass its reference to the job
-            # and we restore the original job heartbeat
-            try:
-                component_ref = suricate.component.Component(
-                    old_component_ref.name,
-                    old_component_ref.container,
-                    old_component_ref.startup_delay
-                )
-                args = channel, component_ref, attribute, timer, units, description
-                Publisher.s.modify_job(job_id, args=args)
-            except CannotGetComponentError:
-                pass  # Do nothing
+            component = job.args[1]
+            job_ids = [
+                j.id for j in Publisher.s.get_jobs()
+                if get_component_name(j) == component.name
+            ]
+            Publisher.open_circuit(component, job_ids, job_id, str(event.exception))
         else:
             # TODO: manage the unexpected exception
             pass
 
+    @classmethod
+    def open_circuit(cls, component, job_ids, failed_job_id, message):
+        """Pause the jobs `job_ids` of `component` until a probe gets it
+        again (see CircuitBreaker).  The jobs but `failed_job_id`, that
+        has already published its error, publish `message`."""
+        circuit, new_jobs, opened = breakers.open(component, job_ids)
+        for job_id in new_jobs:
+            job = cls.s.get_job(job_id)
+            if not job:
+                continue
+            cls.s.pause_job(job_id)
+            if job_id != failed_job_id and job.func is batch_publisher:
+                _, _, batch, timer = job.args
+                for channel, attr, units, description, options in batch:
+                    cls._set_attr_error(
+                        component.name, attr, timer, units,
+                        description, message, options)
+        if opened:
+            cls.schedule_probe(circuit)
+
+    @classmethod
+    def schedule_probe(cls, circuit):
+        name = circuit.component.name
+        run_date = utc_timestamp_to_datetime(time.time() + circuit.delay())
+        cls.s.add_job(
+            func=cls.probe,
+            args=(name,),
+            id='probe:%s' % name,
+            trigger='date',
+            run_date=run_date,
+            replace_existing=True)
+
+    @classmethod
+    def probe(cls, name):
+        """Get the component `name` again and resume its jobs, or retry
+        later in case the component is still not available."""
+        circuit = breakers.get(name)
+        if circuit is None:
+            return
+        old_component_ref = circuit.component
+        import suricate.component
+        # The cached reference can be broken without the ClientPool
+        # knowing it (i.e. after a read timeout): get a new one
+        get_pool().invalidate(name)
+        try:
+            component_ref = suricate.component.Component(
+                old_component_ref.name,
+                old_component_ref.container,
+                old_component_ref.startup_delay
+            )
+        except CannotGetComponentError:
+            circuit.failures += 1
+            cls.schedule_probe(circuit)
+            return
+        breakers.close(name)
+        # Pass the new reference to the jobs, and resume them
+        for job_id in circuit.jobs:
+            job = cls.s.get_job(job_id)
+            if not job:
+                continue
+            args = list(job.args)
+            args[1] = component_ref
+            cls.s.modify_job(job_id, args=tuple(args))
+            cls.s.resume_job(job_id)
+
 
     @classmethod
     def start(cls):
+        suricate.services.health.start(config['SCHEDULER'].get('health_period', 1))
         cls.s.start()
 
 
     @classmethod
     def shutdown(cls):
+        suricate.services.health.stop()
+        for pusher in cls.pushers.values():
+            pusher.stop()
+        cls.pushers.clear()
+        breakers.clear()
+        throttles.clear()
         for job in cls.s.get_jobs():
             job.remove()
         cls.s.shutdown(wait=True)
         cls.s = Scheduler()
 
 
+    @staticmethod
     def _set_attr_error(
-            self,
             component_name,
             attribute,
             timer,
             units,
             description,
-            message):
+            message,
+            options=None):
         data_dict = {
             'error': message,
             'value': '',
@@ -301,6 +629,8 @@ class Publisher(object):
             'timestamp': datetime.utcnow().strftime(dt_format)
         }
         job_id = '%s/%s' % (component_name, attribute)
-        if not r.hmset(job_id, data_dict):
+        pipe = r.pipeline()
+        register([job_id], pipe)
+        index = publish(pipe, job_id, data_dict, options or {})
+        if not pipe.execute()[index]:
             logger.error('cannot write on redis: "%s"' % message)
-        r.publish(job_id, json.dumps(data_dict))
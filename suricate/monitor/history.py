@@ -0,0 +1,68 @@
+import time
+
+from suricate.configuration import config
+from suricate.redisdb import get_redis
+
+
+r = get_redis()
+
+
+def history_key(channel):
+    """Return the key of the stream of `channel`, i.e. 'SYS/Comp/attr:history'."""
+    return channel + ':history'
+
+
+def append(pipe, channel, sample):
+    """Queue on `pipe` the XADD of `sample` to the stream of `channel`.
+
+    The stream is capped, approximately, to the last
+    config['SCHEDULER']['history_maxlen'] samples, or to the samples of
+    the last `history_max_age` seconds when it is set.  The history is
+    disabled when both of them are not set, or zero.
+
+    XADD requires Redis >= 5.0, and MINID (history_max_age) Redis >= 6.2:
+    with an older server, the whole transaction of `pipe` would fail.
+    """
+    scheduler = config['SCHEDULER']
+    max_age = scheduler.get('history_max_age')
+    maxlen = scheduler.get('history_maxlen', 0)
+    if max_age:
+        # redis-py does not know MINID (Redis >= 6.2)
+        min_id = int((time.time() - max_age) * 1000)
+        args = []
+        for field, value in sample.items():
+            args.extend((field, value))
+        pipe.execute_command(
+            'XADD', history_key(channel), 'MINID', '~', min_id, '*', *args)
+    elif maxlen:
+        pipe.xadd(history_key(channel), sample, maxlen=maxlen)
+
+
+def read(channel, count=None, start='-', end='+'):
+    """Return the samples of `channel` from the newest to the oldest.
+
+    The samples are dictionaries with an `id` key, the identifier of the
+    stream entry.  `start` and `end` can be identifiers, or milliseconds
+    since the epoch, and at most `count` samples are returned.
+    """
+    entries = r.xrevrange(history_key(channel), end, start, count)
+    return [dict(fields, id=entry_id) for entry_id, fields in entries]
+
+
+def read_after(channel, last_id='0', count=None, block=None):
+    """Return the samples of `channel` added after the entry `last_id`,
+    from the oldest to the newest.
+
+    A consumer that does not want to lose any sample passes the `id` of
+    the last sample it got.  With `block` milliseconds, the call waits
+    up to `block` for a new sample in case there is none.
+    """
+    result = r.xread({history_key(channel): last_id}, count, block)
+    if not result:
+        return []
+    _, entries = result[0]
+    return [dict(fields, id=entry_id) for entry_id, fields in entries]
+
+
+def delete(channel, pipe=None):
+    (r if pipe is None else pipe).delete(history_key(channel))
@@ -1,133 +1,443 @@
+import os
 import json
+import time
 import logging
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
 from datetime import datetime
-import redis
 import sqlalchemy as db
 from sqlalchemy.orm import sessionmaker
 
 import suricate.services
+from suricate import wire
 from suricate.models import Attribute
 from suricate.api.config import api_config
 from suricate.configuration import config, dt_format
-from suricate.errors import (
-    CannotGetComponentError,
-    ComponentAttributeError,
-    ACSNotRunningError,
-)
+from suricate.monitor import history
+from suricate.monitor.breakers import throttles
+from suricate.monitor.states import monotonic, states
+from suricate.monitor.stats import stats
+from suricate.redisdb import attributes_key, get_redis
+from suricate.errors import CannotGetComponentError, ACSNotRunningError
 
 
 logger = logging.getLogger('suricate')
-r = redis.StrictRedis()
+r = get_redis()
+
+
+# Last published value and publication time of every channel
+last_samples = {}
+
+
+class AttributeReader(object):
+    """Read the component attributes in a pool of threads.
+
+    A hung ACS call can not hold a publisher job, that waits for the
+    value until a timeout and then abandons the read.  A component can
+    not have more than `max_reads` reads running: its other reads wait
+    in a queue, so a stuck component can not take more than `max_reads`
+    threads of the pool.  The reads of a component with `max_reads`
+    abandoned reads still running are refused.
+    """
+
+    def __init__(self, max_workers=20, max_reads=4):
+        self.executor = ThreadPoolExecutor(max_workers)
+        self.pid = os.getpid()
+        self.max_reads = max_reads
+        self.running = defaultdict(int)  # Component name -> running reads
+        self.pending = defaultdict(deque)  # Component name -> queued reads
+        self.hung = defaultdict(int)  # Component name -> abandoned reads
+        self.lock = threading.Lock()
+
+    def submit(self, component, attribute):
+        """Return the future of read_attribute(), or None in case the
+        component has too many hung reads."""
+        name = component.name
+        future = Future()
+        with self.lock:
+            if self.hung[name] >= self.max_reads:
+                return None
+            self.pending[name].append((future, component, attribute))
+            if self.running[name] >= self.max_reads:
+                return future  # A running read of the component starts it
+            self.running[name] += 1
+        self.executor.submit(self._run, name)
+        return future
+
+    def read(self, component, attribute):
+        """Return read_attribute(), recording the ACS call duration."""
+        start = time.time()
+        try:
+            return read_attribute(component, attribute)
+        finally:
+            channel = '%s/%s' % (component.name, attribute)
+            stats.record(channel, 'acs', time.time() - start)
+
+    def abandon(self, name, future):
+        """The read of component `name` hangs until `future` is done."""
+        if future.cancel():
+            return  # Still in the queue, it will not run
+        with self.lock:
+            self.hung[name] += 1
+        future.add_done_callback(lambda f: self._done(name))
+
+    def _run(self, name):
+        """Run the queued reads of component `name`, until there are none."""
+        while True:
+            with self.lock:
+                if not self.pending[name]:
+                    self.running[name] -= 1
+                    return
+                future, component, attribute = self.pending[name].popleft()
+            if not future.set_running_or_notify_cancel():
+                continue  # Abandoned while in the queue
+            try:
+                future.set_result(self.read(component, attribute))
+            except Exception, ex:
+                future.set_exception(ex)
+
+    def _done(self, name):
+        with self.lock:
+            self.hung[name] -= 1
+
+
+reader = None  # The AttributeReader, created at the first read
+reader_lock = threading.Lock()
+
+
+def get_reader():
+    global reader
+    with reader_lock:
+        # A forked process does not inherit the threads of the reader
+        if reader is None or reader.pid != os.getpid():
+            reader = AttributeReader(
+                config['SCHEDULER'].get('read_pool_size', 20),
+                config['SCHEDULER'].get('component_max_reads', 4),
+            )
+    return reader
 
 
 def acs_publisher(channel, component, attribute, timer, units='', description=''):
     """Get the component reference and a property as a dict object."""
-    data_dict = {
-        'value': '',
-        'error': '',
-        'timer': timer,
-        'units': units,
-        'description': description,
-        'timestamp': datetime.utcnow().strftime(dt_format),
-    }
+    acs_batch_publisher(
+        channel,
+        component,
+        [(channel, attribute, units, description, {})],
+        timer
+    )
+
+
+def acs_batch_publisher(job_id, component, attributes, timer):
+    """Sample several attributes of the same component in one pass.
+
+    The `attributes` argument is a list of `(channel, attribute, units,
+    description, options)` tuples sharing the same `timer`.  Every
+    attribute has its own Redis key and channel, but the Redis writes of
+    all of them are queued on a pipeline and sent to the server in a
+    single round trip, when the samples have been collected.  The
+    attributes are read concurrently by the AttributeReader, and a read
+    that lasts more than `options['timeout']` seconds (default
+    config['SCHEDULER']['read_timeout']) gives an error sample.  An
+    attribute that can not be read gives an error sample only on its own
+    channel, and it is not read again until its backoff has elapsed (see
+    Throttles), while the other attributes keep publishing.  The
+    `options` dictionary can also set the deadband of the attribute (see
+    within_deadband()) and the typed publication (see publish()).
+    """
+    data_dicts = []
+    for channel, attribute, units, description, options in attributes:
+        data_dicts.append({
+            'value': '',
+            'error': '',
+            'timer': timer,
+            'units': units,
+            'description': description,
+            'timestamp': datetime.utcnow().strftime(dt_format),
+        })
+    pipe = r.pipeline()
+    online = False  # The component has just come online
+    key, message = '', ''  # Do not log `message` twice, check `key` first
+    log = logger.error
+    unchanged = set()  # Channels whose value is within the deadband
+    values = {}  # Channel -> sampled value
     try:
         error_message = ''
         if component.name in component.unavailables:
             raise CannotGetComponentError()
 
-        with suricate.services.logging_lock:
-            startup_time = r.get('__%s/startup_time' % component.name)
-            if startup_time:
-                t = datetime.strptime(startup_time, dt_format)
-                if datetime.utcnow() <= t:
-                    message = '%s not ready: startup in progress' % component.name
-                    data_dict.update({'error': message})
-                    r.hmset('components', {component.name: 'unavailable'})
-                    key = '__%s/info' % component.name
-                    if r.get(key) != message:
-                        logger.info(message)
-                    r.set(key, message)
-                    return
+        if states.in_startup(component.name):
+            message = '%s not ready: startup in progress' % component.name
+            for data_dict in data_dicts:
+                data_dict.update({'error': message})
+            forget(attributes)
+            states.set_available(component.name, False, pipe)
+            key = '__%s/info' % component.name
+            log = logger.info
+            return
 
-        if hasattr(component, '_get_' + attribute):  # It is a property
-            get_property_obj = getattr(component, '_get_' + attribute)
-            property_obj = get_property_obj()
-            value, comp = property_obj.get_sync()
-            # TODO: check Acspy.Common.TimeHelper for right conversion
-            epoch = (comp.timeStamp - 122192928000000000) / 10000000.
-            t = datetime.fromtimestamp(epoch)
-        else:  # It is a method, just call it
-            method = getattr(component, attribute)
-            t = datetime.utcnow()
-            value = method()
-        if isinstance(value, list):
-            value = tuple(value)  # Convert the value to a tuple
-        value = str(value)
-        data_dict.update(
-            {'value': value, 'timestamp': t.strftime(dt_format)}
-        )
-        # Update the components redis key
-        with suricate.services.logging_lock:
-            if r.hget('components', component.name) != 'available':
-                message = 'OK - component %s is online' % component.name
-                key = '__%s/info' % component.name
-                if r.get(key) != message:
-                    logger.info(message)
-                r.set(key, message)
-                r.hmset('components', {component.name: 'available'})
-                r.delete('__%s/info' % component.name)
-            r.delete('__%s/error' % component.name)
+        start = monotonic()
+        reader = get_reader()
+        throttled = [throttles.error(item[0]) for item in attributes]
+        futures = [
+            None if waiting else reader.submit(component, item[1])
+            for item, waiting in zip(attributes, throttled)
+        ]
+        default_timeout = config['SCHEDULER'].get('read_timeout', 5)
+        for item, data_dict, future, waiting in zip(
+                attributes, data_dicts, futures, throttled):
+            channel, attribute, _, _, options = item
+            timeout = options.get('timeout', default_timeout)
+            error = waiting
+            try:
+                if waiting:
+                    pass  # Not read until its backoff has elapsed
+                elif future is None:
+                    error = 'too many hung reads from %s' % component.name
+                else:
+                    value, t = future.result(max(start + timeout - monotonic(), 0))
+            except TimeoutError:
+                reader.abandon(component.name, future)
+                error = 'timeout reading %s from %s' % (attribute, component.name)
+            except AttributeError:
+                error = 'cannot get attribute %s from %s' % (
+                        attribute, component.name)
+            if error:
+                if not waiting:
+                    throttles.failed(channel, error)
+                error_message = error
+                data_dict.update({'error': error_message})
+                forget([item])
+                continue
+            throttles.succeeded(channel)
+            if within_deadband(channel, value, options):
+                unchanged.add(channel)
+            values[channel] = value
+            data_dict.update(
+                {'value': str(value), 'timestamp': t.strftime(dt_format)}
+            )
+        # Update the component state: it is not available only in case
+        # none of its attributes has been read
+        available = bool(values)
+        online = states.set_available(component.name, available, pipe) and available
+        states.clear_message('__%s/info' % component.name, pipe)
+        if error_message:
+            key = '__%s/error' % component.name
+        else:
+            states.clear_message('__%s/error' % component.name, pipe)
     except CannotGetComponentError, ex:
         print(ex)
         if not suricate.services.is_manager_online():
             error_message = 'ACS not running'
             key = '__manager/error'
             Exc = ACSNotRunningError
-            with suricate.services.logging_lock:
-                r.delete('__%s/error' % component.name)
+            states.clear_message('__%s/error' % component.name, pipe)
         else:
             error_message = 'cannot get component %s' % component.name
             key = '__%s/error' % component.name
             Exc = CannotGetComponentError
-            with suricate.services.logging_lock:
-                r.delete('__manager/error')
-        data_dict.update({'error': error_message})
-        r.hmset('components', {component.name: 'unavailable'})
+            states.clear_message('__manager/error', pipe)
+        for data_dict in data_dicts:
+            data_dict.update({'value': '', 'error': error_message})
+        unchanged.clear()
+        forget(attributes)
+        states.set_available(component.name, False, pipe)
         raise Exc(error_message)
-    except AttributeError:
-        error_message = 'cannot get attribute %s from %s' % (
-                attribute, component.name)
-        data_dict.update({'error': error_message})
-        key = '__%s/error' % component.name
-        r.hmset('components', {component.name: 'unavailable'})
-        raise ComponentAttributeError(error_message)
     except Exception, ex:
         logger.debug(str(ex))
         if not suricate.services.is_manager_online():
             error_message = 'ACS not running'
             key = '__manager/error'
             Exc = ACSNotRunningError
-            with suricate.services.logging_lock:
-                r.delete('__%s/error' % component.name)
+            states.clear_message('__%s/error' % component.name, pipe)
         else:
             error_message = 'cannot get component %s' % component.name
             key = '__%s/error' % component.name
             Exc = CannotGetComponentError
-            with suricate.services.logging_lock:
-                r.delete('__manager/error')
-        data_dict.update({'error': error_message})
-        r.hmset('components', {component.name: 'unavailable'})
+            states.clear_message('__manager/error', pipe)
+        for data_dict in data_dicts:
+            data_dict.update({'value': '', 'error': error_message})
+        unchanged.clear()
+        forget(attributes)
+        states.set_available(component.name, False, pipe)
         raise Exc(error_message)
     finally:
-        if error_message:
-            with suricate.services.logging_lock:
-                if r.get(key) != error_message:
-                    logger.error(error_message)
-                r.set(key, error_message)
-
-        if not r.hmset(channel, data_dict):
-            logger.error('cannot write data on redis for %s' % channel)
-        r.publish(channel, json.dumps(data_dict))
-        healthy_job_key = 'healthy_job:%s' % channel
-        if not r.set(healthy_job_key, 1):
-            logger.error('cannot set %s' % healthy_job_key)
+        message = error_message or message
+        # Log only the new messages
+        new_message = key and states.set_message(key, message, pipe)
+        channel_indexes = []
+        for item, data_dict in zip(attributes, data_dicts):
+            channel, options = item[0], item[4]
+            if channel in unchanged:
+                continue
+            index = publish(pipe, channel, data_dict, options, values.get(channel))
+            channel_indexes.append((channel, index))
+        start = time.time()
+        results = pipe.execute()
+        duration = time.time() - start
+        for channel, _ in channel_indexes:
+            stats.record(channel, 'redis', duration)
+
+        if new_message:
+            log(message)
+        if online:
+            logger.info('OK - component %s is online' % component.name)
+        for channel, index in channel_indexes:
+            if not results[index]:
+                logger.error('cannot write data on redis for %s' % channel)
+
+
+def publish(pipe, channel, data_dict, options, value=None):
+    """Queue the writes of a sample on `pipe`, return the HMSET index.
+
+    The sample is written to the `channel` hash, appended to the
+    `channel` history when it is enabled (see suricate.monitor.history)
+    and published as JSON on `channel`, with the value as a string.
+
+    In case of `options['typed']` the hash also has the `type` and
+    `typed_value` (JSON) fields, and the sample is published on
+    `<channel>:typed` with a value of its own JSON type: numbers stay
+    numbers and sequences become arrays.
+
+    The config['SCHEDULER']['wire_format'] 'binary' publishes on `channel`
+    the binary messages of suricate.wire instead of the JSON ones, and
+    'json+binary' publishes them on `<channel>:bin`.
+    """
+    index = len(pipe)
+    wire_format = config['SCHEDULER'].get('wire_format', 'json')
+    if wire_format != 'json' and wire.msgpack is None:
+        wire_format = 'json'  # Publisher.__init__() logged the error
+    type_name, typed_value = '', None
+    if not data_dict['error'] and (options.get('typed') or wire_format != 'json'):
+        type_name, typed_value = encode_value(value)
+    if options.get('typed'):
+        fields = dict(
+            data_dict,
+            type=type_name,
+            typed_value=json.dumps(typed_value)
+        )
+        pipe.hmset(channel, fields)
+        typed_dict = dict(data_dict, type=type_name, value=typed_value)
+        pipe.publish(channel + ':typed', json.dumps(typed_dict))
+    else:
+        fields = data_dict
+        pipe.hmset(channel, fields)
+    history.append(pipe, channel, fields)
+    if wire_format != 'json':
+        payload = wire.encode(
+            type_name,
+            typed_value,
+            data_dict['error'],
+            data_dict['timestamp']
+        )
+    if wire_format == 'binary':
+        pipe.publish(channel, payload)
+    else:
+        pipe.publish(channel, json.dumps(data_dict))
+    if wire_format == 'json+binary':
+        pipe.publish(channel + ':bin', payload)
+    return index
+
+
+def register(channels, pipe=None):
+    """Add `channels` to the `attributes_key` set, that the DBFiller
+    reads.  The publisher registers a channel when it creates its job,
+    monitor or error sample, not at every sample."""
+    if channels:
+        (r if pipe is None else pipe).sadd(attributes_key, *channels)
+
+
+def encode_value(value):
+    """Return the type name and the JSON encodable form of `value`.
+
+    The type name is 'bool', 'int', 'float' or 'str', and the sequences
+    of items of the same type have a '[]' suffix, i.e. 'float[]'.  The
+    values of other types are converted to strings.
+    """
+    if isinstance(value, tuple):
+        items = [encode_value(item) for item in value]
+        types = set(type_name for type_name, _ in items)
+        type_name = '%s[]' % types.pop() if len(types) == 1 else 'list'
+        return type_name, [item for _, item in items]
+    elif isinstance(value, bool):
+        return 'bool', value
+    elif isinstance(value, (int, long)):
+        return 'int', value
+    elif isinstance(value, float):
+        return 'float', value
+    else:
+        return 'str', str(value)
+
+
+def read_attribute(component, attribute):
+    """Return the value of a component attribute and its timestamp."""
+    if hasattr(component, '_get_' + attribute):  # It is a property
+        get_property_obj = getattr(component, '_get_' + attribute)
+        property_obj = get_property_obj()
+        value, comp = property_obj.get_sync()
+        t = acs_time(comp.timeStamp)
+    else:  # It is a method, just call it
+        method = getattr(component, attribute)
+        t = datetime.utcnow()
+        value = method()
+    if isinstance(value, list):
+        value = tuple(value)  # Convert the value to a tuple
+    return value, t
+
+
+def acs_time(timestamp):
+    """Convert an ACS timestamp (100ns since 1582-10-15) to datetime."""
+    # TODO: check Acspy.Common.TimeHelper for right conversion
+    epoch = (timestamp - 122192928000000000) / 10000000.
+    return datetime.fromtimestamp(epoch)
+
+
+def within_deadband(channel, value, options):
+    """Return True if `value` has not to be published.
+
+    The value is not published when it differs from the last published
+    one less than options['deadband'], unless options['heartbeat']
+    seconds have elapsed since the last publication.  The deadband is
+    absolute, or relative to the last value if options['deadband_type']
+    is 'relative'.  For sequences, the deadband applies to every item.
+    """
+    deadband = options.get('deadband')
+    if deadband is None:
+        return False
+    now = time.time()
+    last_value, last_time = last_samples.get(channel, (None, None))
+    heartbeat = options.get('heartbeat')
+    if last_time is None:
+        changed = True
+    elif heartbeat is not None and now - last_time >= heartbeat:
+        changed = True
+    elif isinstance(value, tuple) != isinstance(last_value, tuple):
+        changed = True
+    elif isinstance(value, tuple) and len(value) != len(last_value):
+        changed = True
+    else:
+        relative = options.get('deadband_type') == 'relative'
+        if isinstance(value, tuple):
+            pairs = zip(value, last_value)
+        else:
+            pairs = [(value, last_value)]
+        changed = any(
+            exceeds(new, old, deadband, relative) for new, old in pairs
+        )
+    if changed:
+        last_samples[channel] = (value, now)
+    return not changed
+
+
+def exceeds(new, old, deadband, relative=False):
+    """Return True if `new` differs from `old` more than `deadband`."""
+    try:
+        return abs(new - old) > (deadband * abs(old) if relative else deadband)
+    except TypeError:  # Not a number
+        return new != old
+
+
+def forget(attributes):
+    """Remove the last published values of `attributes`."""
+    for item in attributes:
+        last_samples.pop(item[0], None)
@@ -0,0 +1,140 @@
+import time
+import logging
+from datetime import datetime
+
+
+import suricate.services
+from suricate.configuration import dt_format
+from suricate.monitor.jobs import acs_time, forget, publish, within_deadband
+from suricate.monitor.states import monotonic, states
+from suricate.monitor.stats import stats
+from suricate.redisdb import get_redis
+
+
+logger = logging.getLogger('suricate')
+r = get_redis()
+
+
+class PushPublisher(object):
+    """Publish the values pushed by the monitor of an ACS property.
+
+    Instead of polling the property every `timer` seconds, the publisher
+    registers a BACI monitor (see Component.monitor()) that calls push()
+    every `timer` seconds, and also when the value changes more than an
+    absolute deadband.  The publisher is not alive when the monitor does
+    not push values for a while, and restart() creates a new monitor.
+    """
+
+    def __init__(
+            self,
+            component,
+            attribute,
+            timer,
+            units='',
+            description='',
+            options=None):
+        self.component = component
+        self.attribute = attribute
+        self.channel = '%s/%s' % (component.name, attribute)
+        self.timer = timer
+        self.units = units
+        self.description = description
+        self.options = options or {}
+        self.monitor = None
+        self.last_push = monotonic()
+
+    def start(self):
+        delta = None
+        if self.options.get('deadband_type', 'absolute') == 'absolute':
+            delta = self.options.get('deadband')
+        self.last_push = monotonic()
+        self.monitor = self.component.monitor(
+            self.attribute,
+            self.push,
+            self.timer,
+            delta
+        )
+
+    def stop(self):
+        monitor, self.monitor = self.monitor, None
+        if monitor is not None:
+            try:
+                monitor.destroy()
+            except Exception, ex:  # The component has gone away
+                logger.debug('cannot destroy %s monitor: %s' % (self.channel, ex))
+
+    def restart(self):
+        """Get a new reference to the component and monitor it again."""
+        self.stop()
+        import suricate.component
+        name = self.component.name
+        try:
+            self.component = suricate.component.Component(
+                name,
+                self.component.container,
+                self.component.startup_delay
+            )
+            self.start()
+        except Exception:
+            if not suricate.services.is_manager_online():
+                self.error('ACS not running', '__manager/error')
+            else:
+                self.error('cannot get component %s' % name)
+
+    def is_alive(self):
+        return monotonic() - self.last_push < 3 * self.timer + 1
+
+    def push(self, value, timestamp):
+        """Publish a value of the monitor, with its ACS timestamp."""
+        self.last_push = monotonic()
+        name = self.component.name
+        pipe = r.pipeline()
+        if states.in_startup(name):
+            message = '%s not ready: startup in progress' % name
+            forget([(self.channel,)])
+            states.set_available(name, False, pipe)
+            if states.set_message('__%s/info' % name, message, pipe):
+                logger.info(message)
+            self._publish(pipe, message)
+            pipe.execute()
+            return
+
+        if isinstance(value, list):
+            value = tuple(value)  # Convert the value to a tuple
+        if within_deadband(self.channel, value, self.options):
+            return
+        online = states.set_available(name, True, pipe)
+        states.clear_message('__%s/info' % name, pipe)
+        states.clear_message('__%s/error' % name, pipe)
+        index = self._publish(pipe, '', value, acs_time(timestamp))
+        start = time.time()
+        results = pipe.execute()
+        stats.record(self.channel, 'redis', time.time() - start)
+        if online:
+            logger.info('OK - component %s is online' % name)
+        if not results[index]:
+            logger.error('cannot write data on redis for %s' % self.channel)
+
+    def error(self, message, key=None):
+        """Publish an error sample: the component is not available."""
+        name = self.component.name
+        key = key or '__%s/error' % name
+        forget([(self.channel,)])
+        pipe = r.pipeline()
+        states.set_available(name, False, pipe)
+        new_message = states.set_message(key, message, pipe)
+        self._publish(pipe, message)
+        pipe.execute()
+        if new_message:
+            logger.error(message)
+
+    def _publish(self, pipe, error, value=None, t=None):
+        data_dict = {
+            'value': '' if error else str(value),
+            'error': error,
+            'timer': self.timer,
+            'units': self.units,
+            'description': self.description,
+            'timestamp': (t or datetime.utcnow()).strftime(dt_format),
+        }
+        return publish(pipe, self.channel, data_dict, self.options, value)
@@ -1,14 +1,37 @@
-import redis
+import math
+import time
+import zlib
+import logging
+from collections import defaultdict, deque
 
+from apscheduler.events import EVENT_JOB_REMOVED
+from apscheduler.executors.base import run_job
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.jobstores.base import (
+    BaseJobStore,
+    ConflictingIdError,
+    JobLookupError,
+)
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+from apscheduler.util import datetime_to_utc_timestamp, utc_timestamp_to_datetime
+from suricate.configuration import config
 from suricate.monitor import jobs
+from suricate.monitor.stats import stats
 
 
-__all__ = ['Scheduler']
+logger = logging.getLogger('suricate')
+
+
+__all__ = ['Scheduler', 'attribute_ids']
 
 
 class ACSScheduler(BackgroundScheduler):
 
+    def __init__(self, *args, **kwargs):
+        super(ACSScheduler, self).__init__(*args, **kwargs)
+        self.phase_groups = {}  # Job id -> phase group
+
     def add_attribute_job(
             self,
             component_ref,
@@ -20,17 +43,384 @@ class ACSScheduler(BackgroundScheduler):
         # Job identifier: namespace/component/attribute
         job_id = '/'.join([component_ref.name, attr])
         channel = channel if channel else job_id
-        r = redis.StrictRedis()
-        error_job_key = 'error_job:%s' % channel
-        r.delete(error_job_key)
+        jobs.register([channel])
         return super(ACSScheduler, self).add_job(
             func=publisher,
             args=(channel, component_ref, attr, timer, units, description),
             id=job_id,
-            trigger='interval',
-            seconds=timer)
+            trigger=self.interval_trigger(job_id, timer))
+
+    def add_component_job(self, component_ref, attributes, timer, phase_group=None):
+        """Add a job that samples several attributes of a component.
+
+        The `attributes` argument is a list of `(attribute, units,
+        description)` tuples, all of them sampled every `timer` seconds.
+        A tuple can have a fourth item, the dictionary of the attribute
+        options (see acs_batch_publisher()).  In case the component
+        already has a job with the same timer, the attributes are added
+        to that job.  The jobs of the same `phase_group` and timer run
+        together (see interval_trigger()).
+        """
+        # Job identifier: namespace/component@timer
+        job_id = '%s@%s' % (component_ref.name, timer)
+        if phase_group:
+            self.phase_groups[job_id] = phase_group
+        else:
+            self.phase_groups.pop(job_id, None)
+        batch = []
+        for attribute in attributes:
+            attr, units, description = attribute[:3]
+            options = attribute[3] if len(attribute) > 3 else {}
+            channel = '/'.join([component_ref.name, attr])
+            batch.append((channel, attr, units, description, options))
+        jobs.register([item[0] for item in batch])
+        job = self.get_job(job_id)
+        if job:
+            channels = [item[0] for item in batch]
+            old_batch = job.args[2]
+            batch = [a for a in old_batch if a[0] not in channels] + batch
+            return self.modify_job(
+                job_id,
+                args=(job_id, component_ref, batch, timer))
+        return super(ACSScheduler, self).add_job(
+            func=batch_publisher,
+            args=(job_id, component_ref, batch, timer),
+            id=job_id,
+            trigger=self.interval_trigger(job_id, timer))
+
+    def _create_default_executor(self):
+        return TimedPoolExecutor()
+
+    def reschedule_job(self, job_id, jobstore=None, trigger=None, **trigger_args):
+        if trigger == 'interval' and trigger_args.keys() == ['seconds']:
+            trigger = self.interval_trigger(job_id, trigger_args.pop('seconds'))
+        return super(ACSScheduler, self).reschedule_job(
+            job_id,
+            jobstore,
+            trigger,
+            **trigger_args
+        )
+
+    def interval_trigger(self, job_id, seconds):
+        """Return the trigger of a job executed every `seconds`.
+
+        In case of config['SCHEDULER']['phase_spreading'] the job runs at
+        a fixed offset inside its period, given by the CRC32 of the job
+        identifier or of its phase group.  That way the jobs sharing the
+        same timer do not run together, and the offsets do not change
+        when suricate restarts, because the periods start from the epoch.
+        """
+        if not config['SCHEDULER'].get('phase_spreading', True):
+            return IntervalTrigger(seconds=seconds)
+        key = self.phase_groups.get(job_id, job_id)
+        phase = (zlib.crc32(key) & 0xffffffff) / 2.0**32 * seconds
+        start = math.floor(time.time() / seconds) * seconds + phase
+        return IntervalTrigger(
+            seconds=seconds,
+            start_date=utc_timestamp_to_datetime(start)
+        )
+
+
+class TimedPoolExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor that records the lateness of the attribute jobs.
+
+    The lateness is the delay of the job start from its scheduled time,
+    and it goes to the `lateness` histogram of every attribute of the job.
+    """
+
+    def _do_submit_job(self, job, run_times):
+        def callback(f):
+            exc, tb = (f.exception_info() if hasattr(f, 'exception_info') else
+                       (f.exception(), getattr(f.exception(), '__traceback__', None)))
+            if exc:
+                self._run_job_error(job.id, exc, tb)
+            else:
+                self._run_job_success(job.id, f.result())
+
+        f = self._pool.submit(
+            timed_run_job,
+            job,
+            job._jobstore_alias,
+            run_times,
+            self._logger.name
+        )
+        f.add_done_callback(callback)
+
+
+def timed_run_job(job, jobstore_alias, run_times, logger_name):
+    """Record the lateness of `job` and run it, as run_job() does."""
+    if job.func in (publisher, batch_publisher):
+        lateness = time.time() - datetime_to_utc_timestamp(run_times[-1])
+        for channel in attribute_ids(job):
+            stats.record(channel, 'lateness', lateness)
+    return run_job(job, jobstore_alias, run_times, logger_name)
+
+
+def attribute_ids(job):
+    """Return the identifiers of the attributes sampled by `job`."""
+    if job.func is batch_publisher:
+        return [item[0] for item in job.args[2]]
+    else:
+        return [job.id]
+
+
+class TimingWheelJobStore(BaseJobStore):
+    """Store the jobs in a hierarchical timing wheel.
+
+    The time is divided in ticks of `resolution` seconds.  The first
+    wheel has a slot for each one of the next `slots` ticks, and a slot
+    of the wheel `n` spans a whole turn of the wheel `n-1`.  When a wheel
+    completes a turn, the jobs of the next slot of the upper wheel are
+    moved down.  Adding, updating and removing a job cost O(1), and the
+    store never delays a job by more than one tick.
+    """
+
+    def __init__(self, resolution=0.01, slots=64, levels=4):
+        super(TimingWheelJobStore, self).__init__()
+        self.resolution = resolution
+        self.slots = slots
+        self.levels = levels
+        self.remove_all_jobs()
+
+    def lookup_job(self, job_id):
+        return self._index.get(job_id, (None, None))[0]
+
+    def get_due_jobs(self, now):
+        now_timestamp = datetime_to_utc_timestamp(now)
+        self._advance(self._get_tick(now_timestamp))
+        pending = []
+        for job in self._due.values():
+            if datetime_to_utc_timestamp(job.next_run_time) <= now_timestamp:
+                pending.append(job)
+        return sorted(pending, key=lambda job: (job.next_run_time, job.id))
+
+    def get_next_run_time(self):
+        jobs = list(self._due.values())
+        if not jobs:  # Look for the first non empty slot of the first wheel
+            for i in range(1, self.slots):
+                slot = self._wheels[0][(self._tick + i) % self.slots]
+                if slot:
+                    jobs = list(slot.values())
+                    break
+        run_times = [job.next_run_time for job in jobs]
+        if self._wheeled > sum(len(slot) for slot in self._wheels[0]) or self._overflow:
+            # Wake up in the middle of the tick that ends the turn of the
+            # first wheel, in order to move down the jobs of the upper ones
+            turn = (self._tick // self.slots + 1) * self.slots
+            timestamp = (turn + 0.5) * self.resolution
+            run_times.append(utc_timestamp_to_datetime(timestamp))
+        return min(run_times) if run_times else None
+
+    def get_all_jobs(self):
+        jobs = [job for job, _ in self._index.values()]
+        # Paused jobs go to the end of the list
+        jobs.sort(key=lambda job: (job.next_run_time is None, job.next_run_time, job.id))
+        return jobs
+
+    def add_job(self, job):
+        if job.id in self._index:
+            raise ConflictingIdError(job.id)
+        self._place(job)
+
+    def update_job(self, job):
+        if job.id not in self._index:
+            raise JobLookupError(job.id)
+        self._remove(job.id)
+        self._place(job)
+
+    def remove_job(self, job_id):
+        if job_id not in self._index:
+            raise JobLookupError(job_id)
+        self._remove(job_id)
+
+    def remove_all_jobs(self):
+        self._wheels = [
+            [{} for slot in range(self.slots)] for level in range(self.levels)
+        ]
+        self._due = {}  # Jobs whose tick is elapsed
+        self._overflow = {}  # Jobs beyond the last wheel
+        self._paused = {}
+        self._index = {}  # job id -> (job, bucket)
+        self._wheeled = 0  # Number of jobs in the wheels
+        self._tick = self._get_tick(time.time())
+
+    def shutdown(self):
+        self.remove_all_jobs()
+
+    def _get_tick(self, timestamp):
+        return int(math.floor(timestamp / self.resolution))
+
+    def _place(self, job):
+        timestamp = datetime_to_utc_timestamp(job.next_run_time)
+        if timestamp is None:
+            bucket = self._paused
+        else:
+            tick = self._get_tick(timestamp)
+            delta = tick - self._tick
+            if delta <= 0:
+                bucket = self._due
+            else:
+                bucket = self._overflow
+                span = self.slots
+                for wheel in self._wheels:
+                    if delta < span:
+                        bucket = wheel[tick // (span // self.slots) % self.slots]
+                        self._wheeled += 1
+                        break
+                    span *= self.slots
+        bucket[job.id] = job
+        self._index[job.id] = (job, bucket)
+
+    def _remove(self, job_id):
+        job, bucket = self._index.pop(job_id)
+        del bucket[job_id]
+        if not any(bucket is b for b in (self._due, self._overflow, self._paused)):
+            self._wheeled -= 1
+        return job
+
+    def _move(self, bucket):
+        """Place again the jobs of `bucket`, according to the current tick"""
+        for job_id in list(bucket):
+            self._place(self._remove(job_id))
+
+    def _advance(self, tick):
+        if not self._wheeled:
+            # Nothing to move down, jump to `tick`
+            self._tick = max(tick, self._tick)
+            self._move(self._overflow)
+            return
+        while self._tick < tick:
+            self._tick += 1
+            # Move down the jobs of the upper wheels, the higher first
+            buckets = []
+            span = self.slots
+            for wheel in self._wheels[1:]:
+                if self._tick % span:
+                    break
+                buckets.append(wheel[self._tick // span % self.slots])
+                span *= self.slots
+            else:
+                if self._tick % span == 0:
+                    buckets.append(self._overflow)
+            for bucket in reversed(buckets):
+                self._move(bucket)
+            self._move(self._wheels[0][self._tick % self.slots])
+
+
+class TimingWheelScheduler(ACSScheduler):
+    """ACSScheduler that keeps its jobs in a TimingWheelJobStore"""
+
+    def _create_default_jobstore(self):
+        resolution = config['SCHEDULER'].get('wheel_resolution', 0.01)
+        return TimingWheelJobStore(resolution=resolution)
+
+
+class ComponentPoolExecutor(TimedPoolExecutor):
+    """Run the jobs in a bounded thread pool, limiting every component.
+
+    A component can not have more than `max_inflight` running jobs, so a
+    stuck component never holds more than `max_inflight` threads of the
+    pool.  The runs over the limit wait in the queue of their component,
+    and they start as soon as a running job of the component ends: they
+    are late (see the `lateness` statistics), but not lost.  A queued run
+    is an instance of its job, so a job is never queued twice, and the
+    queue of a component is not longer than the number of its jobs.
+    """
+
+    def __init__(self, max_workers=10, max_inflight=2):
+        super(ComponentPoolExecutor, self).__init__(max_workers)
+        self.max_inflight = max_inflight
+        self.inflight = defaultdict(int)  # Component name -> running jobs
+        self.pending = defaultdict(deque)  # Component name -> queued runs
+        self._components = {}  # Job id -> component name
+
+    def start(self, scheduler, alias):
+        super(ComponentPoolExecutor, self).start(scheduler, alias)
+        scheduler.add_listener(self._job_removed, EVENT_JOB_REMOVED)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            self.pending.clear()
+        super(ComponentPoolExecutor, self).shutdown(wait)
+
+    def _do_submit_job(self, job, run_times):
+        # Called by submit_job(), holding the lock
+        name = get_component_name(job)
+        if name is None:
+            return super(ComponentPoolExecutor, self)._do_submit_job(job, run_times)
+        self._components[job.id] = name
+        if self.inflight[name] >= self.max_inflight:
+            self.pending[name].append((job, run_times))
+        else:
+            self.inflight[name] += 1
+            super(ComponentPoolExecutor, self)._do_submit_job(job, run_times)
+
+    def _run_job_success(self, job_id, events):
+        self._release(job_id)
+        super(ComponentPoolExecutor, self)._run_job_success(job_id, events)
+
+    def _run_job_error(self, job_id, exc, traceback=None):
+        self._release(job_id)
+        super(ComponentPoolExecutor, self)._run_job_error(job_id, exc, traceback)
+
+    def _release(self, job_id):
+        """Start the next queued run of the component of `job_id`."""
+        with self._lock:
+            name = self._components.get(job_id)
+            if name is None:
+                return
+            if self._instances[job_id] <= 1:  # The last instance ends
+                del self._components[job_id]
+            if self.pending[name]:
+                job, run_times = self.pending[name].popleft()
+                super(ComponentPoolExecutor, self)._do_submit_job(job, run_times)
+            else:
+                self.inflight[name] -= 1
+                if not self.inflight[name]:
+                    del self.inflight[name]
+                    del self.pending[name]
+
+    def _job_removed(self, event):
+        """Drop the queued runs of a removed job."""
+        with self._lock:
+            name = self._components.get(event.job_id)
+            if name is None:
+                return
+            queue = self.pending[name]
+            for item in [item for item in queue if item[0].id == event.job_id]:
+                queue.remove(item)
+                self._instances[event.job_id] -= 1
+            if not self._instances[event.job_id]:
+                del self._instances[event.job_id]
+                del self._components[event.job_id]
+
+
+class BoundedScheduler(ACSScheduler):
+    """ACSScheduler that runs its jobs in a ComponentPoolExecutor"""
+
+    def _create_default_executor(self):
+        return ComponentPoolExecutor(
+            max_workers=config['SCHEDULER'].get('pool_size', 10),
+            max_inflight=config['SCHEDULER'].get('component_max_inflight', 2),
+        )
+
+
+def get_component_name(job):
+    """Return the name of the component sampled by `job`, if any."""
+    if len(job.args) > 1:
+        return getattr(job.args[1], 'name', None)
+
 
+schedulers = {
+    'background': ACSScheduler,
+    'timing_wheel': TimingWheelScheduler,
+    'bounded': BoundedScheduler,
+}
 
-# TODO: check the configuration and bind the right scheduler
-Scheduler = ACSScheduler
+engine = config['SCHEDULER'].get('engine', 'background')
+Scheduler = schedulers.get(engine)
+if Scheduler is None:
+    logger.error('unknown scheduler engine %s: using background' % engine)
+    Scheduler = ACSScheduler
 publisher = jobs.acs_publisher
+batch_publisher = jobs.acs_batch_publisher
@@ -0,0 +1,111 @@
+import os
+import threading
+from datetime import datetime, timedelta
+
+
+from suricate.configuration import dt_format
+from suricate.redisdb import get_redis
+
+try:
+    from time import monotonic
+except ImportError:  # Python 2: elapsed real time of os.times()
+    def monotonic():
+        return os.times()[4]
+
+
+r = get_redis()
+
+
+class ComponentStates(object):
+    """In-process registry of the component states.
+
+    The registry is the source of truth of the availability, the end of
+    the startup and the last logged messages of the components published
+    by this process.  The states are mirrored to Redis only when they
+    change, so the publisher jobs never read them from Redis.  The
+    methods that mirror a state take an optional Redis `pipe`, in order
+    to queue the write on a pipeline.  Every component (and every message
+    key) has its own lock, so the threads of different components never
+    wait for each other.
+    """
+
+    def __init__(self):
+        self.locks = {}  # Component name or message key -> RLock
+        self.available = {}  # Component name -> True or False
+        self.deadlines = {}  # Component name -> monotonic() end of startup
+        self.messages = {}  # Redis key -> last logged message
+
+    def clear(self):
+        self.available.clear()
+        self.deadlines.clear()
+        self.messages.clear()
+
+    def lock(self, name):
+        """Return the lock of the component (or message key) `name`.
+
+        The lock is reentrant, so Component can hold it while it starts.
+        """
+        lock = self.locks.get(name)
+        if lock is None:
+            # setdefault() is atomic: all the threads get the same lock
+            lock = self.locks.setdefault(name, threading.RLock())
+        return lock
+
+    def start(self, name, startup_delay, pipe=None):
+        """The component `name` needs `startup_delay` seconds to start."""
+        pipe = r if pipe is None else pipe
+        startup_time = datetime.utcnow() + timedelta(seconds=startup_delay)
+        with self.lock(name):
+            self.deadlines[name] = monotonic() + startup_delay
+            pipe.set('__%s/startup_time' % name, startup_time.strftime(dt_format))
+
+    def remove(self, name, pipe=None):
+        """Forget the component `name`, and remove its Redis keys."""
+        pipe = r if pipe is None else pipe
+        with self.lock(name):
+            self.available.pop(name, None)
+            self.deadlines.pop(name, None)
+            pipe.hdel('components', name)
+            pipe.delete('__%s/startup_time' % name)
+        self.clear_message('__%s/info' % name, pipe)
+        self.clear_message('__%s/error' % name, pipe)
+
+    def in_startup(self, name):
+        return monotonic() < self.deadlines.get(name, 0)
+
+    def is_available(self, name):
+        return self.available.get(name, False)
+
+    def set_available(self, name, available, pipe=None):
+        """Set the availability of `name` and return True if it changed."""
+        pipe = r if pipe is None else pipe
+        with self.lock(name):
+            if self.available.get(name) == available:
+                return False
+            self.available[name] = available
+            status = 'available' if available else 'unavailable'
+            pipe.hmset('components', {name: status})
+        return True
+
+    def set_message(self, key, message, pipe=None):
+        """Set the message of `key` and return True if it changed.
+
+        A message that did not change has already been logged.
+        """
+        pipe = r if pipe is None else pipe
+        with self.lock(key):
+            if self.messages.get(key) == message:
+                return False
+            self.messages[key] = message
+            pipe.set(key, message)
+        return True
+
+    def clear_message(self, key, pipe=None):
+        """Remove the message of `key`, if any."""
+        pipe = r if pipe is None else pipe
+        with self.lock(key):
+            if self.messages.pop(key, None) is not None:
+                pipe.delete(key)
+
+
+states = ComponentStates()
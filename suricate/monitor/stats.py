@@ -0,0 +1,154 @@
+import math
+import threading
+from collections import defaultdict
+
+
+# Metrics of the samples, in seconds
+METRICS = {
+    'lateness': 'delay of the job start from its scheduled time',
+    'acs': 'duration of the ACS call',
+    'redis': 'duration of the Redis writes',
+}
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class Histogram(object):
+    """Count the values in buckets of exponentially growing width.
+
+    The buckets go from `minimum` to `maximum` seconds, and every bucket
+    is `ratio` times wider than the previous one, so the percentiles
+    have a relative error less than `ratio - 1`.  Recording a value
+    costs a logarithm and a dictionary update.
+    """
+
+    minimum = 1e-6
+    maximum = 1e3
+    ratio = 2 ** 0.25
+
+    def __init__(self, counts=None, total=0.0, peak=0.0):
+        self.counts = defaultdict(int, counts or {})  # Bucket -> count
+        self.total = total
+        self.peak = peak
+
+    def record(self, value):
+        if value <= self.minimum:
+            index = 0
+        else:
+            value = min(value, self.maximum)
+            index = int(math.log(value / self.minimum, self.ratio)) + 1
+        self.counts[index] += 1
+        self.total += value
+        self.peak = max(self.peak, value)
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] += count
+        self.total += other.total
+        self.peak = max(self.peak, other.peak)
+
+    def count(self):
+        return sum(self.counts.values())
+
+    def percentile(self, q):
+        """Return the upper bound of the bucket of quantile `q`."""
+        rank = q * self.count()
+        cumulative = 0
+        for index in sorted(self.counts):
+            cumulative += self.counts[index]
+            if cumulative >= rank:
+                return min(self.minimum * self.ratio ** index, self.peak)
+        return 0.0
+
+    def dump(self):
+        return {'counts': dict(self.counts), 'total': self.total, 'peak': self.peak}
+
+
+class SamplingStats(object):
+    """Histograms of the METRICS of every attribute."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}  # (channel, metric) -> Histogram
+
+    def record(self, channel, metric, value):
+        with self.lock:
+            histogram = self.histograms.get((channel, metric))
+            if histogram is None:
+                histogram = self.histograms[(channel, metric)] = Histogram()
+            histogram.record(value)
+
+    def remove(self, channels):
+        """Forget the histograms of `channels`."""
+        channels = set(channels)
+        with self.lock:
+            for key in list(self.histograms):
+                if key[0] in channels:
+                    del self.histograms[key]
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+
+    def dump(self):
+        """Return the histograms as {channel: {metric: histogram}} of
+        builtin types, in order to send them to another process."""
+        dump = {}
+        with self.lock:
+            for (channel, metric), histogram in self.histograms.items():
+                dump.setdefault(channel, {})[metric] = histogram.dump()
+        return dump
+
+
+def summary(dump):
+    """Return the count, sum, maximum and percentiles of a stats dump.
+
+    The result has a key for every attribute, and the aggregate values
+    of all of them in the '*' key.
+    """
+    result = {}
+    aggregate = dict((metric, Histogram()) for metric in METRICS)
+    for channel, metrics in dump.items():
+        result[channel] = {}
+        for metric, data in metrics.items():
+            histogram = Histogram(data['counts'], data['total'], data['peak'])
+            aggregate[metric].merge(histogram)
+            result[channel][metric] = describe(histogram)
+    result['*'] = dict(
+        (metric, describe(histogram))
+        for metric, histogram in aggregate.items() if histogram.count()
+    )
+    return result
+
+
+def describe(histogram):
+    description = {
+        'count': histogram.count(),
+        'sum': histogram.total,
+        'max': histogram.peak,
+    }
+    for q in QUANTILES:
+        description['p%g' % (q * 100)] = histogram.percentile(q)
+    return description
+
+
+def prometheus(summary):
+    """Return the summary in the Prometheus text exposition format."""
+    lines = []
+    for metric, help_text in sorted(METRICS.items()):
+        name = 'suricate_sample_%s_seconds' % metric
+        lines.append('# HELP %s %s' % (name, help_text))
+        lines.append('# TYPE %s summary' % name)
+        for channel, metrics in sorted(summary.items()):
+            if channel == '*' or metric not in metrics:
+                continue
+            data = metrics[metric]
+            label = 'attribute="%s"' % channel
+            for q in QUANTILES:
+                lines.append('%s{%s,quantile="%g"} %g' % (
+                    name, label, q, data['p%g' % (q * 100)]))
+            lines.append('%s_sum{%s} %g' % (name, label, data['sum']))
+            lines.append('%s_count{%s} %d' % (name, label, data['count']))
+    return '\n'.join(lines) + '\n'
+
+
+stats = SamplingStats()
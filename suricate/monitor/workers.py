@@ -0,0 +1,245 @@
+import time
+import zlib
+import logging
+import threading
+import multiprocessing
+from multiprocessing import Process, Pipe
+
+from suricate.configuration import config
+from suricate.monitor.core import Publisher, check_components
+from suricate.redisdb import get_redis
+
+
+logger = logging.getLogger('suricate')
+r = get_redis()
+
+
+def get_workers_number():
+    """Return the number of publisher processes set in configuration.
+
+    The value of config['SCHEDULER']['workers'] can be an integer or
+    'auto', that means a publisher process for every CPU core.
+    """
+    workers = config['SCHEDULER'].get('workers', 1)
+    if workers == 'auto':
+        return multiprocessing.cpu_count()
+    try:
+        return max(int(workers), 1)
+    except ValueError:
+        logger.error('cannot convert workers %s to int' % workers)
+        return 1
+
+
+def get_load(targets):
+    """Return the number of samples per second of a component."""
+    load = 0.0
+    for attribute in targets.get('properties', []) + targets.get('methods', []):
+        load += 1.0 / attribute['timer']
+    return load
+
+
+def partition(components, workers, sharding='container'):
+    """Split the COMPONENTS configuration in at most `workers` shards.
+
+    With `sharding='hash'` a component goes to the shard given by the
+    CRC32 of its name, so it always ends up in the same shard.  With
+    `sharding='container'` the components of a container stay in the
+    same shard, and the containers are balanced by samples per second.
+    """
+    shards = [{} for i in range(workers)]
+    if sharding == 'hash':
+        for name, targets in components.items():
+            index = (zlib.crc32(name) & 0xffffffff) % workers
+            shards[index][name] = targets
+    else:
+        containers = {}
+        for name, targets in components.items():
+            container = containers.setdefault(targets.get('container'), {})
+            container[name] = targets
+        loads = [0.0] * workers
+        # The heaviest container goes to the lightest shard
+        items = sorted(
+            containers.values(),
+            key=lambda comps: sum(get_load(t) for t in comps.values()),
+            reverse=True
+        )
+        for comps in items:
+            index = loads.index(min(loads))
+            shards[index].update(comps)
+            loads[index] += sum(get_load(t) for t in comps.values())
+    return [shard for shard in shards if shard]
+
+
+def run_worker(components, connection):
+    """Publish `components` and serve the requests of the PublisherPool."""
+    # redis-py resets the connection pool inherited from the parent on
+    # its first use, but not in a thread safe way: reset it before the
+    # publisher threads start
+    r.connection_pool.reset()
+    publisher = Publisher(components, shared=True)
+    publisher.start()
+    try:
+        while True:
+            try:
+                command, args = connection.recv()
+            except EOFError:
+                break  # The PublisherPool has gone away
+            if command == 'shutdown':
+                break
+            method = getattr(publisher, command)
+            connection.send(method(*args))
+    finally:
+        Publisher.shutdown()
+
+
+class PublisherPool(object):
+    """Shard the components across several publisher processes.
+
+    Every worker process runs a Publisher of its own shard of components.
+    The pool has the same `add_jobs()`, `reload()`, `attribute_jobs()`,
+    `stats()`, `clients()`, `start()` and `shutdown()` interface of
+    Publisher, and it restarts the crashed workers.  A request to a
+    worker that does not answer in config['SCHEDULER']['worker_timeout']
+    seconds returns an empty result.
+    """
+
+    def __init__(self, components, workers, sharding=None):
+        r.delete('components')
+        self.sharding = sharding or config['SCHEDULER'].get('sharding', 'container')
+        self.shards = partition(components, workers, self.sharding)
+        self.workers = [None] * len(self.shards)
+        self.lock = threading.Lock()
+        # A request holds the lock of its worker only
+        self.worker_locks = [threading.Lock() for shard in self.shards]
+        # The shards change one add_jobs() or reload() at a time
+        self.shards_lock = threading.Lock()
+        self.running = False
+
+    def start(self):
+        with self.lock:
+            for index in range(len(self.shards)):
+                self._start_worker(index)
+        self.running = True
+        watchdog = threading.Thread(target=self._watch)
+        watchdog.daemon = True
+        watchdog.start()
+
+    def shutdown(self):
+        self.running = False
+        with self.lock:
+            for process, connection in self.workers:
+                try:
+                    connection.send(('shutdown', ()))
+                except IOError:
+                    pass  # The worker is not running
+            for process, connection in self.workers:
+                process.join(10)
+                if process.is_alive():
+                    process.terminate()
+
+    def add_jobs(self, components):
+        with self.shards_lock:
+            for name, targets in components.items():
+                index = self._get_shard_index(name, targets)
+                # Keep the shard up to date, in case the worker restarts
+                shard_targets = self.shards[index].setdefault(name, {})
+                for key, value in targets.items():
+                    if key in ('properties', 'methods'):
+                        names = [attribute['name'] for attribute in value]
+                        attributes = shard_targets.get(key, [])
+                        shard_targets[key] = [
+                            a for a in attributes if a['name'] not in names
+                        ] + value
+                    else:
+                        shard_targets[key] = value
+                self._request(index, 'add_jobs', {name: targets})
+
+    def reload(self, components):
+        check_components(components)
+        shards = [{} for shard in self.shards]
+        for name, targets in components.items():
+            shards[self._get_shard_index(name, targets)][name] = targets
+        changes = {'added': [], 'removed': [], 'modified': []}
+        with self.shards_lock:
+            for index, shard in enumerate(shards):
+                self.shards[index] = shard
+                result = self._request(index, 'reload', shard) or {}
+                for key, channels in result.items():
+                    changes[key].extend(channels)
+        return changes
+
+    def attribute_jobs(self):
+        jobs = []
+        for index in range(len(self.workers)):
+            jobs.extend(self._request(index, 'attribute_jobs'))
+        return jobs
+
+    def stats(self):
+        dump = {}
+        for index in range(len(self.workers)):
+            # Every worker has its own attributes
+            dump.update(self._request(index, 'stats') or {})
+        return dump
+
+    def clients(self):
+        total = {}
+        for index in range(len(self.workers)):
+            # Every worker has its own client pool
+            for key, value in (self._request(index, 'clients') or {}).items():
+                total[key] = total.get(key, 0) + value
+        return total
+
+    def _get_shard_index(self, name, targets):
+        """Return the index of the shard that has to publish `name`."""
+        for index, shard in enumerate(self.shards):
+            if name in shard:
+                return index
+        if self.sharding == 'hash':
+            return (zlib.crc32(name) & 0xffffffff) % len(self.shards)
+        for index, shard in enumerate(self.shards):
+            for comp in shard.values():
+                if comp.get('container') == targets.get('container'):
+                    return index
+        loads = [sum(get_load(t) for t in shard.values()) for shard in self.shards]
+        return loads.index(min(loads))
+
+    def _request(self, index, command, *args):
+        timeout = config['SCHEDULER'].get('worker_timeout', 60)
+        with self.worker_locks[index]:
+            process, connection = self.workers[index]
+            try:
+                while connection.poll():
+                    connection.recv()  # Late answer of a timed out request
+                connection.send((command, args))
+                if connection.poll(timeout):
+                    return connection.recv()
+                logger.error('publisher worker %d is not answering' % index)
+            except (IOError, EOFError):
+                logger.error('publisher worker %d is not running' % index)
+            return []
+
+    def _start_worker(self, index):
+        connection, worker_connection = Pipe()
+        process = Process(
+            target=run_worker,
+            args=(self.shards[index], worker_connection)
+        )
+        process.daemon = True
+        process.start()
+        # Only the worker has to keep its end open, so the pool gets an
+        # EOFError instead of waiting forever in case the worker dies
+        worker_connection.close()
+        self.workers[index] = (process, connection)
+
+    def _watch(self):
+        while self.running:
+            time.sleep(config['SCHEDULER']['reschedule_interval'])
+            with self.lock:
+                if not self.running:
+                    break
+                for index, (process, connection) in enumerate(self.workers):
+                    if not process.is_alive():
+                        logger.error('publisher worker %d died: restarting' % index)
+                        with self.worker_locks[index]:
+                            connection.close()
+                            self._start_worker(index)
@@ -0,0 +1,53 @@
+import threading
+
+import redis
+
+from suricate.configuration import config
+
+
+# Set of the attribute channels, written by the publisher for the DBFiller
+attributes_key = 'attributes'
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_redis():
+    """Return the Redis client shared by all the modules.
+
+    The client takes its connections from a single pool, configured by
+    the REDIS section of the configuration (see make_pool()).  A forked
+    process shares the client of its parent, and redis-py gives it new
+    connections.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            pool = make_pool(config.get('REDIS') or {})
+            _client = redis.StrictRedis(connection_pool=pool)
+        return _client
+
+
+def make_pool(settings):
+    """Return a connection pool from the REDIS `settings`.
+
+    The pool connects to `host`:`port`, or to `unix_socket_path` when it
+    is set, and selects the database `db`.  It keeps at most `pool_size`
+    connections: a client that needs one more waits for a free
+    connection up to `pool_timeout` seconds.
+    """
+    kwargs = {
+        'db': settings.get('db', 0),
+        'socket_timeout': settings.get('socket_timeout'),
+        'max_connections': settings.get('pool_size', 50),
+        'timeout': settings.get('pool_timeout', 20),
+    }
+    path = settings.get('unix_socket_path')
+    if path:
+        kwargs['connection_class'] = redis.UnixDomainSocketConnection
+        kwargs['path'] = path
+    else:
+        kwargs['host'] = settings.get('host', 'localhost')
+        kwargs['port'] = settings.get('port', 6379)
+        kwargs['socket_connect_timeout'] = settings.get('socket_connect_timeout')
+    return redis.BlockingConnectionPool(**kwargs)
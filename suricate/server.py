@@ -3,31 +3,41 @@ from __future__ import with_statement
 
 import os
 import sys
+import signal
 import socket
 import logging
-from flask import jsonify, abort, request
+import threading
+
+import yaml
+from flask import jsonify, abort, request, Response
 from flask_migrate import Migrate
+import suricate.services
 from suricate.configuration import config
+from suricate.paths import config_file
 from suricate.monitor.core import Publisher
+from suricate.monitor.workers import PublisherPool, get_workers_number
+from suricate.monitor.stats import summary, prometheus
 from suricate.api import tasks, create_app, db
 from suricate.api.main import main
 from suricate.models import Command, Attribute
 from suricate.dbfiller import DBFiller
 
 publisher = None
+components_file = config_file  # The file of the COMPONENTS to reload
 dbfiller = DBFiller()
 logger = logging.getLogger('suricate')
 app = create_app(config['DATABASE'])
+probe_ttl = config['SCHEDULER'].get('probe_ttl', 1)
+suricate.services.RUN_ON_MANAGER_HOST = config.get('RUN_ON_MANAGER_HOST', True)
+suricate.services.process_table.ttl = probe_ttl
+suricate.services.remote_process_table.interval = probe_ttl
+suricate.services.remote_process_table.stale = max(5.0, 3 * probe_ttl)
 migrate = Migrate(app, db)
 
 
 @main.route('/publisher/api/v0.1/jobs', methods=['GET'])
 def get_jobs():
-    jobs = []
-    for j in publisher.s.get_jobs():
-        sec, mic = j.trigger.interval.seconds, j.trigger.interval.microseconds
-        jobs.append({'id': j.id, 'timer': sec + mic / (1.0 * 10 ** 6)})
-    return jsonify({'jobs': jobs})
+    return jsonify({'jobs': publisher.attribute_jobs()})
 
 
 @main.route('/publisher/api/v0.1/jobs', methods=['POST'])
@@ -84,6 +94,26 @@ def create_job():
         ), 201
 
 
+@main.route('/publisher/api/v0.1/reload', methods=['POST'])
+def reload_components():
+    """Reload the COMPONENTS of the request, or of the configuration file."""
+    components = request.json.get('COMPONENTS') if request.json else None
+    try:
+        changes = reload_publisher(components)
+    except (IOError, ValueError, yaml.YAMLError), ex:
+        logger.error('cannot reload the components: %s' % ex)
+        abort(400)
+    return jsonify({'changes': changes})
+
+
+@main.route('/publisher/api/v0.1/stats', methods=['GET'])
+def get_stats():
+    stats = summary(publisher.stats())
+    if request.args.get('format') == 'prometheus':
+        return Response(prometheus(stats), mimetype='text/plain; version=0.0.4')
+    return jsonify({'stats': stats, 'clients': publisher.clients()})
+
+
 @main.route('/publisher/api/v0.1/config', methods=['GET'])
 def get_config():
     return jsonify(config)
@@ -113,10 +143,44 @@ def start_publisher(components=None):
     global publisher
     # In case a component is not available, Publisher.add_jobs()
     # writes a log an error message
-    publisher = Publisher(components) if components else Publisher()
+    workers = get_workers_number()
+    if components and workers > 1:
+        publisher = PublisherPool(components, workers)
+    else:
+        publisher = Publisher(components) if components else Publisher()
     publisher.start()
 
 
+def reload_publisher(components=None):
+    """Apply a new COMPONENTS configuration to the running publisher.
+
+    In case `components` is None, they are read from `components_file`.
+    Return the channels of the added, removed and modified attributes.
+    """
+    if components is None:
+        with open(components_file) as stream:
+            components = (yaml.safe_load(stream) or {}).get('COMPONENTS') or {}
+    changes = publisher.reload(components)
+    logger.info('components reloaded: %d added, %d removed, %d modified' % (
+        len(changes['added']), len(changes['removed']), len(changes['modified'])))
+    return changes
+
+
+def sighup_handler(signum, frame):
+    # The signal can interrupt the main thread while it is changing the
+    # jobs: reload in another thread, that waits for the publisher lock
+    thread = threading.Thread(target=reload_components_file)
+    thread.daemon = True
+    thread.start()
+
+
+def reload_components_file():
+    try:
+        reload_publisher()
+    except Exception, ex:
+        logger.error('cannot reload the components: %s' % ex)
+
+
 def stop_publisher():
     if publisher is not None:
         publisher.shutdown()
@@ -140,8 +204,13 @@ def start_webserver():
         sys.exit(1)
 
 
-def start(components=None):
+def start(components=None, path=None):
+    """Start the server.  A SIGHUP reloads the COMPONENTS of the
+    configuration file `path` (default the user configuration file)."""
+    global components_file
     logger.info('suricate server is starting...')
+    components_file = path or config_file
+    signal.signal(signal.SIGHUP, sighup_handler)
     start_publisher(components)
     start_dbfiller()
     start_webserver()
@@ -1,63 +1,282 @@
 from __future__ import print_function, unicode_literals
+import os
+import json
+import time
 import subprocess
 import threading
 import logging
-import redis
- 
-# If you import config from suricate.configuration to check
-# config['RUN_ON_MANAGER_HOST'] then ps_output() will block
-# in case the manager is online. I temporarily define the
-# parameter here, waiting for a better idea.
+
+from suricate.redisdb import get_redis
+
+# The server sets it from config['RUN_ON_MANAGER_HOST']
 RUN_ON_MANAGER_HOST = True
 
-logging_lock = threading.Lock()
-r = redis.StrictRedis()
+r = get_redis()
+
+
+class ProcessTable(object):
+    """Command lines of the running processes, read from /proc.
+
+    A snapshot of the process table is taken at most once every `ttl`
+    seconds, and it is shared by all the callers.  The lines matching a
+    keyword are cached with the snapshot, so a check costs a dictionary
+    lookup until the snapshot expires.
+    """
+
+    def __init__(self, ttl=1.0, proc='/proc'):
+        self.ttl = ttl
+        self.proc = proc
+        self.lock = threading.Lock()
+        self.commands = []
+        self.matches = {}  # Keyword -> matching command lines
+        self.timestamp = None
+
+    def grep(self, keyword):
+        """Return the command lines containing `keyword`, one per line."""
+        with self.lock:
+            now = time.time()
+            if self.timestamp is None or not 0 <= now - self.timestamp < self.ttl:
+                self.commands = self.read()
+                self.matches = {}
+                self.timestamp = now
+            result = self.matches.get(keyword)
+            if result is None:
+                lines = [c for c in self.commands if keyword in c]
+                result = self.matches[keyword] = '\n'.join(lines)
+            return result
+
+    def read(self):
+        commands = []
+        for pid in os.listdir(self.proc):
+            if not pid.isdigit():
+                continue
+            try:
+                with open(os.path.join(self.proc, pid, 'cmdline'), 'rb') as f:
+                    cmdline = f.read()
+            except (IOError, OSError):
+                continue  # The process has gone away
+            if cmdline:  # Kernel threads have no command line
+                commands.append(
+                    cmdline.replace(b'\0', b' ').strip().decode('utf-8', 'replace'))
+        return commands
+
+
+class RemoteProcessTable(object):
+    """Command lines of the processes of the manager host.
+
+    A single long-lived session, by default ``ssh -T discos@<manager>``,
+    runs a shell loop that prints the process table every `interval`
+    seconds, and a thread keeps the latest snapshot.  The checks are
+    served from the snapshot, and a snapshot older than `stale` seconds
+    raises IOError.  The session starts again when it exits or stalls,
+    but not more than once every `retry` seconds.
+    """
+
+    marker = '--- end of suricate snapshot ---'
+
+    def __init__(self, command=None, interval=1.0, stale=5.0, retry=10.0):
+        self.command = command
+        self.interval = interval
+        self.stale = stale
+        self.retry = retry
+        self.lock = threading.Lock()
+        self.ready = threading.Event()  # Set by the first snapshot
+        self.process = None
+        self.started = None  # Start time of the session
+        self.commands = []
+        self.matches = {}  # Keyword -> matching command lines
+        self.timestamp = None
+
+    def grep(self, keyword):
+        """Return the command lines containing `keyword`, one per line."""
+        if self.connect():
+            self.ready.wait(self.stale)
+        with self.lock:
+            if self.timestamp is None or time.time() - self.timestamp > self.stale:
+                raise IOError('no recent process table from the manager host')
+            result = self.matches.get(keyword)
+            if result is None:
+                lines = [c for c in self.commands if keyword in c]
+                result = self.matches[keyword] = '\n'.join(lines)
+            return result
+
+    def connect(self):
+        """Start the session in case it is not running or it is stalled.
+
+        Return True if the session has been started.
+        """
+        with self.lock:
+            now = time.time()
+            running = self.process is not None and self.process.poll() is None
+            if (running and self.timestamp is not None and
+                    now - self.timestamp <= self.stale):
+                return False  # The session is working
+            if self.started is not None and now - self.started <= self.retry:
+                return False  # Do not retry too often
+            self.close()
+            self.started = now
+            self.ready.clear()
+            with open(os.devnull, 'w') as devnull:
+                self.process = subprocess.Popen(
+                    self.get_command(),
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=devnull,
+                    universal_newlines=True,
+                    bufsize=1
+                )
+            self.process.stdin.write(
+                'while true; do ps -eo args; echo "%s"; sleep %s; done\n' % (
+                    self.marker, self.interval))
+            self.process.stdin.flush()
+            reader = threading.Thread(target=self.read, args=(self.process,))
+            reader.daemon = True
+            reader.start()
+            return True
+
+    def read(self, process):
+        lines = []
+        for line in iter(process.stdout.readline, ''):
+            line = line.rstrip('\n')
+            if line != self.marker:
+                lines.append(line)
+                continue
+            with self.lock:
+                if process is not self.process:
+                    break  # The session has been closed
+                self.commands, lines = lines, []
+                self.matches = {}
+                self.timestamp = time.time()
+            self.ready.set()
+
+    def close(self):
+        process, self.process = self.process, None
+        if process is not None and process.poll() is None:
+            try:
+                process.kill()
+                process.wait()
+            except OSError:
+                pass  # Already exited
+
+    def get_command(self):
+        if self.command is not None:
+            return self.command
+        from Acspy.Util.ACSCorba import getManagerHost
+        return ['ssh', '-T', 'discos@%s' % getManagerHost()]
+
+
+process_table = ProcessTable()
+remote_process_table = RemoteProcessTable()
+_manager_connection_error = False
 
 
 def ps_output(keyword):
-    result = ''
-    cmd = 'ps aux | grep %s' % keyword
+    global _manager_connection_error
     if RUN_ON_MANAGER_HOST is True:
-        result = subprocess.check_output(cmd, shell=True)
-    else:
-        key = '__manager_connection/error'
-        try:
-            from Acspy.Util.ACSCorba import getManagerHost
-            ssh_process = subprocess.Popen(
-                ['ssh', '-T', 'discos@%s' % getManagerHost()],
-                shell=True,
-                stdin=subprocess.PIPE, 
-                stdout = subprocess.PIPE,
-                stderr = subprocess.PIPE,
-                universal_newlines=True,
-                bufsize=0
-            )   
-            ssh_process.stdin.write(cmd + '\n')
-            ssh_process.stdin.write("echo END\n")
-            ssh_process.stdin.write("logout\n")
-            ssh_process.stdin.close()
-            for line in ssh_process.stdout:
-                if line == "END\n":
-                    break
-                else:
-                    result += line
-            r.delete(key)
-        except Exception:
-            message = 'can not get information from manager'
-            if r.get(key) != message:
-                r.set(key, message)
-                logger = logging.getLogger('suricate')
-                logging.error(message)
-            return ''
+        return process_table.grep(keyword)
+    key = '__manager_connection/error'
+    try:
+        result = remote_process_table.grep(keyword)
+    except Exception:
+        message = 'can not get information from manager'
+        if not _manager_connection_error:
+            _manager_connection_error = True
+            r.set(key, message)
+            logging.getLogger('suricate').error(message)
+        return ''
+    if _manager_connection_error:
+        _manager_connection_error = False
+        r.delete(key)
     return result
-    
+
+
+class HealthMonitor(object):
+    """Check the manager and the containers in a background thread.
+
+    Every `period` seconds the thread checks the manager and the watched
+    containers, and keeps their liveness in memory.  The changes are
+    written to the `health` Redis hash, whose keys are `manager` and
+    `container:<name>`, and they are published on the `health` channel
+    as JSON messages like ``{"name": "manager", "online": true}``.
+    """
+
+    def __init__(self, period=1.0):
+        self.period = period
+        self.state = {}  # Key of the health hash -> True or False
+        self.containers = set()  # Containers to check
+        self.thread = None
+        self.stopped = threading.Event()
+
+    def start(self, period=None):
+        if period is not None:
+            self.period = period
+        if self.is_running():
+            return
+        self.state.clear()
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        thread, self.thread = self.thread, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def is_running(self):
+        # A forked process does not inherit the thread of its parent
+        return self.thread is not None and self.thread.is_alive()
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                self.check()
+            except Exception, ex:
+                logging.getLogger('suricate').error('health check failed: %s' % ex)
+            self.stopped.wait(self.period)
+
+    def check(self):
+        pipe = r.pipeline()
+        manager = 'maciManagerJ' in ps_output('maciManager')
+        self.update('manager', manager, pipe)
+        containers = ps_output('StartContainer') if manager else ''
+        for name in list(self.containers):
+            self.update('container:%s' % name, name in containers, pipe)
+        pipe.execute()
+
+    def update(self, key, online, pipe):
+        if self.state.get(key) != online:
+            self.state[key] = online
+            pipe.hset('health', key, 'online' if online else 'offline')
+            pipe.publish('health', json.dumps({'name': key, 'online': online}))
+
+    def watch(self, container):
+        self.containers.add(container)
+
+    def get(self, key):
+        """Return the liveness of `key`, or None if it is not known."""
+        if not self.is_running():
+            return None
+        return self.state.get(key)
+
+
+health = HealthMonitor()
+
 
 def is_container_online(name):
-    return name in ps_output('StartContainer')
+    online = health.get('container:%s' % name)
+    if online is None:
+        health.watch(name)
+        online = name in ps_output('StartContainer')
+    return online
 
 
 def is_manager_online():
-    return 'maciManagerJ' in ps_output('maciManager')
+    online = health.get('manager')
+    if online is None:
+        online = 'maciManagerJ' in ps_output('maciManager')
+    return online
 
 
 def get_client_class():
@@ -0,0 +1,67 @@
+"""Binary encoding of the published samples.
+
+A binary message is a msgpack array ``[version, type, value, error,
+timestamp]``.  It does not repeat units, description and timer, that
+are in the attribute hash.  The value has the type given by ``type``,
+and the sequences of floats (type ``float[]``) are packed as a buffer of
+little endian doubles.  Python clients can decode the messages of a
+``<channel>:bin`` channel by calling :func:`decode`::
+
+    >>> from suricate.wire import decode
+    >>> message = pubsub.get_message()
+    >>> decode(message['data'])['value']
+    [1.1, 2.3, 3.3]
+
+This module does not import the suricate configuration, so the clients
+can use it without a suricate installation in place.
+"""
+import struct
+
+try:
+    import msgpack
+except ImportError:  # msgpack is an optional dependency
+    msgpack = None
+
+
+VERSION = 1  # Schema version of the binary messages
+
+
+def encode(type_name, value, error, timestamp):
+    """Return the binary message of a sample."""
+    if type_name == 'float[]':
+        value = struct.pack('<%dd' % len(value), *value)
+    else:
+        value = _text(value)
+    return msgpack.packb(
+        [VERSION, _text(type_name), value, _text(error), _text(timestamp)],
+        use_bin_type=True,
+    )
+
+
+def decode(payload):
+    """Return the sample of a binary message as a dictionary.
+
+    The dictionary has the `type`, `value`, `error` and `timestamp` keys.
+    """
+    items = msgpack.unpackb(payload, raw=False)
+    if not items or items[0] != VERSION:
+        raise ValueError('unknown binary message version %r' % items[:1])
+    _, type_name, value, error, timestamp = items
+    if type_name == 'float[]':
+        value = list(struct.unpack('<%dd' % (len(value) // 8), value))
+    return {
+        'type': type_name,
+        'value': value,
+        'error': error,
+        'timestamp': timestamp,
+    }
+
+
+def _text(obj):
+    """Convert the byte strings of `obj` to text, in order to pack them
+    as msgpack strings (the bin type is reserved for the buffers)."""
+    if isinstance(obj, bytes):
+        return obj.decode('utf-8', 'replace')
+    elif isinstance(obj, (list, tuple)):
+        return [_text(item) for item in obj]
+    return obj
@@ -30,7 +30,6 @@ ATTRIBUTE = dict(
 )
 
 
-
 jobs_from_data = {
     'jobs':
         [
@@ -68,6 +67,53 @@ def test_create_and_get_jobs(client):
     assert response.get_json() == jobs_from_data
 
 
+def test_get_stats(client):
+    """Get the sampling statistics of the attributes"""
+    from suricate.monitor.stats import stats
+    channel = '%s/%s' % (DATA['component'], DATA['attribute'])
+    for metric in ('lateness', 'acs', 'redis'):
+        for i in range(10):
+            stats.record(channel, metric, 0.001 * (i + 1))
+    response = client.get('%s/stats' % BASE_URL)
+    data = response.get_json()['stats']
+    for metric in ('lateness', 'acs', 'redis'):
+        assert data[channel][metric]['count'] == 10
+        assert data[channel][metric]['max'] == 0.01
+        assert data[channel][metric]['p50'] <= data[channel][metric]['p99']
+        assert data['*'][metric]['count'] == 10
+    response = client.get('%s/stats?format=prometheus' % BASE_URL)
+    text = response.get_data()
+    assert 'suricate_sample_acs_seconds_count{attribute="%s"} 10' % channel in text
+
+
+def test_reload(client):
+    components = {
+        DATA['component']: {
+            'startup_delay': 0,
+            'container': DATA['container'],
+            'properties': [{'name': 'position', 'timer': 0.1}],
+        }
+    }
+    response = client.post(
+        '%s/reload' % BASE_URL,
+        data=json.dumps({'COMPONENTS': components}),
+        headers=HEADERS)
+    assert response.status_code == 200
+    changes = json.loads(response.data)['changes']
+    assert changes['added'] == ['TestNamespace/Positioner/position']
+    response = client.get('%s/jobs' % BASE_URL)
+    assert json.loads(response.data) == jobs_from_data
+
+
+def test_reload_invalid_components(client):
+    components = {DATA['component']: {'container': DATA['container']}}
+    response = client.post(
+        '%s/reload' % BASE_URL,
+        data=json.dumps({'COMPONENTS': components}),
+        headers=HEADERS)
+    assert response.status_code == 400
+
+
 def test_create_jobs_invalid_json(client):
     # Do not json.dumps(DATA)
     response = client.post('%s/jobs' % BASE_URL, data=DATA, headers=HEADERS)
@@ -309,7 +355,7 @@ def test_container_offline(client):
         suricate.services.is_container_online = lambda x: True
 
 
-def test_get_last_attributes(client, dbfiller, redis_client):
+def test_get_last_attributes(client, dbfiller, redis_client, store):
     """Get the last N values of Positioner00/current."""
     key1 = 'SYSTEM/Component/name1'
     key2 = 'SYSTEM/Component/name2'
@@ -317,8 +363,8 @@ def test_get_last_attributes(client, dbfiller, redis_client):
     dbfiller.start()
     for i in range(N):
         ATTRIBUTE['timestamp'] = datetime.utcnow().strftime(dt_format)
-        redis_client.hmset(key1, ATTRIBUTE)
-        redis_client.hmset(key2, ATTRIBUTE)
+        store(key1, ATTRIBUTE)
+        store(key2, ATTRIBUTE)
         time.sleep(config['SCHEDULER']['dbfiller_cycle']*2)
     raw_response = client.get('/attr/%s/%d' % (key1, N))
     response = raw_response.get_json()
@@ -331,13 +377,30 @@ def test_get_last_attributes(client, dbfiller, redis_client):
     assert len(response) == (N - 1)
 
 
-def test_get_last_default_attribute(client, dbfiller, redis_client):
+def test_get_last_attributes_from_redis(client, redis_client, monkeypatch):
+    """The last N values are taken from Redis, when there are N of them."""
+    from suricate.dbfiller import remember
+    monkeypatch.setitem(config['SCHEDULER'], 'recent_values', 3)
+    key = 'SYSTEM/Component/name'
+    pipe = redis_client.pipeline()
+    for i in range(4):
+        remember(pipe, dict(ATTRIBUTE, name=key, value=str(i)))
+    pipe.execute()
+    response = client.get('/attr/%s/3' % key).get_json()
+    assert [a['value'] for a in response] == ['3', '2', '1']
+    assert response[0]['name'] == key
+    # Not in Redis, and not in the database
+    response = client.get('/attr/%s/4' % key).get_json()
+    assert response['status_code'] == 404
+
+
+def test_get_last_default_attribute(client, dbfiller, redis_client, store):
     """Without N, GET /attr returns the last 10 values"""
     key = 'SYSTEM/Component/name'
     dbfiller.start()
     for i in range(15):
         ATTRIBUTE['timestamp'] = datetime.utcnow().strftime(dt_format)
-        redis_client.hmset(key, ATTRIBUTE)
+        store(key, ATTRIBUTE)
         time.sleep(config['SCHEDULER']['dbfiller_cycle']*2)
     raw_response = client.get('/attr/%s' % key)
     response = raw_response.get_json()
@@ -351,7 +414,31 @@ def test_empty_attribute_history(client):
     assert response['error_message'] == 'empty attribute history'
 
 
-def test_get_attribute_from_datetimex(client, dbfiller, redis_client):
+def test_get_attribute_history(client, redis_client, monkeypatch):
+    """GET /attr/.../history/N returns the last N samples of the stream"""
+    from suricate.monitor import history
+    monkeypatch.setitem(config['SCHEDULER'], 'history_maxlen', 1000)
+    key = 'SYSTEM/Component/name'
+    pipe = redis_client.pipeline()
+    for i in range(5):
+        history.append(pipe, key, dict(ATTRIBUTE, value=str(i)))
+    pipe.execute()
+    response = client.get('/attr/%s/history/3' % key).get_json()
+    assert [s['value'] for s in response] == ['4', '3', '2']
+    assert response[0]['name'] == key
+    assert response[0]['units'] == ATTRIBUTE['units']
+    response = client.get('/attr/%s/history' % key).get_json()
+    assert len(response) == 5
+    last_id = response[1]['id']
+    response = client.get('/attr/%s/history/after/%s' % (key, last_id)).get_json()
+    assert [s['value'] for s in response] == ['4']
+    response = client.get('/attr/%s/history/after/foo' % key).get_json()
+    assert response['status_code'] == 400
+    response = client.get('/attr/sys/comp/namefoo/history').get_json()
+    assert response['status_code'] == 404
+
+
+def test_get_attribute_from_datetimex(client, dbfiller, redis_client, store):
     """Get all attribute values from datetime dtx until now"""
     key = 'SYSTEM/Component/name'
     M = 2
@@ -361,14 +448,14 @@ def test_get_attribute_from_datetimex(client, dbfiller, redis_client):
     # Add M attribute values before datetime dtx
     for i in range(M):
         ATTRIBUTE['timestamp'] = datetime.utcnow().strftime(dt_format)
-        redis_client.hmset(key, ATTRIBUTE)
+        store(key, ATTRIBUTE)
         time.sleep(config['SCHEDULER']['dbfiller_cycle']*2)
 
     # Add N attribute values after datetime dtx
     dtx = datetime.utcnow().strftime(dt_format)
     for i in range(N):
         ATTRIBUTE['timestamp'] = datetime.utcnow().strftime(dt_format)
-        redis_client.hmset(key, ATTRIBUTE)
+        store(key, ATTRIBUTE)
         time.sleep(config['SCHEDULER']['dbfiller_cycle']*2)
 
     raw_response = client.get('/attr/%s' % key)
@@ -398,7 +485,7 @@ def test_empty_attribute_history_from_datetimex(client):
     assert response['error_message'] == 'empty attribute history'
 
 
-def test_get_attribute_from_datetimex_to_datetimey(client, dbfiller, redis_client):
+def test_get_attribute_from_datetimex_to_datetimey(client, dbfiller, redis_client, store):
     """Get all attributes from datetime dtx to dty"""
     key = 'SYSTEM/Component/name'
     M = 2
@@ -409,21 +496,21 @@ def test_get_attribute_from_datetimex_to_datetimey(client, dbfiller, redis_clien
     # Add M attribute values before datetime dtx
     for i in range(M):
         ATTRIBUTE['timestamp'] = datetime.utcnow().strftime(dt_format)
-        redis_client.hmset(key, ATTRIBUTE)
+        store(key, ATTRIBUTE)
         time.sleep(config['SCHEDULER']['dbfiller_cycle']*2)
 
     # Add N attribute values after datetime dtx
     dtx = datetime.utcnow().strftime(dt_format)
     for i in range(N):
         ATTRIBUTE['timestamp'] = datetime.utcnow().strftime(dt_format)
-        redis_client.hmset(key, ATTRIBUTE)
+        store(key, ATTRIBUTE)
         time.sleep(config['SCHEDULER']['dbfiller_cycle']*2)
 
     # Add K attribute values after datetime dty
     dty = datetime.utcnow().strftime(dt_format)
     for i in range(K):
         ATTRIBUTE['timestamp'] = datetime.utcnow().strftime(dt_format)
-        redis_client.hmset(key, ATTRIBUTE)
+        store(key, ATTRIBUTE)
         time.sleep(config['SCHEDULER']['dbfiller_cycle']*2)
 
     raw_response = client.get('/attr/%s' % key)
@@ -0,0 +1,57 @@
+import pytest
+import redis
+
+from suricate.redisdb import get_redis, make_pool
+
+
+def test_shared_client():
+    """All the modules share the same client, and its pool."""
+    from suricate.monitor import core, jobs, states
+    from suricate.dbfiller import r as dbfiller_redis
+    r = get_redis()
+    assert r is core.r is jobs.r is states.r is dbfiller_redis
+    assert isinstance(r.connection_pool, redis.BlockingConnectionPool)
+    assert r.ping()
+
+
+def test_tcp_pool():
+    pool = make_pool({
+        'host': '127.0.0.1',
+        'port': 6380,
+        'db': 2,
+        'socket_timeout': 3,
+        'socket_connect_timeout': 1,
+        'pool_size': 7,
+    })
+    assert pool.connection_class is redis.Connection
+    assert pool.max_connections == 7
+    kwargs = pool.connection_kwargs
+    assert (kwargs['host'], kwargs['port'], kwargs['db']) == ('127.0.0.1', 6380, 2)
+    assert kwargs['socket_timeout'] == 3
+    assert kwargs['socket_connect_timeout'] == 1
+
+
+def test_default_pool():
+    """The missing settings take the redis-py defaults."""
+    pool = make_pool({})
+    assert pool.connection_class is redis.Connection
+    kwargs = pool.connection_kwargs
+    assert (kwargs['host'], kwargs['port'], kwargs['db']) == ('localhost', 6379, 0)
+    assert kwargs['socket_timeout'] is None
+
+
+def test_unix_socket_pool():
+    """The unix socket is used in place of host and port."""
+    pool = make_pool({
+        'host': 'ignored',
+        'unix_socket_path': '/var/run/redis/redis.sock',
+        'pool_size': 3,
+    })
+    assert pool.connection_class is redis.UnixDomainSocketConnection
+    assert pool.connection_kwargs['path'] == '/var/run/redis/redis.sock'
+    assert 'host' not in pool.connection_kwargs
+    assert pool.max_connections == 3
+
+
+if __name__ == '__main__':
+    pytest.main()
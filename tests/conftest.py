@@ -14,10 +14,13 @@ from suricate.api import create_app, db
 
 import suricate.services
 from suricate.errors import CannotGetComponentError
-from suricate.configuration import formatter, dt_format
+from suricate.configuration import formatter
+from suricate.monitor.breakers import throttles
 from suricate.monitor.core import Publisher as Publisher_
+from suricate.monitor.jobs import publish, register
 from suricate.dbfiller import DBFiller
 from suricate.monitor.schedulers import Scheduler
+from suricate.monitor.states import states
 from suricate.server import start_publisher, stop_publisher
 
 from apscheduler.executors.pool import ProcessPoolExecutor, ThreadPoolExecutor
@@ -56,6 +59,8 @@ def logger(request):
     for key in r.scan_iter("*"):
         if key.startswith('__'):
             r.delete(key)
+    states.clear()
+    throttles.clear()
     f = NamedTemporaryFile()
     file_handler = logging.FileHandler(f.name, 'w')
     file_handler.setFormatter(formatter)
@@ -173,7 +178,7 @@ class MockACSClient(object):
     def set_exc_name(cls, exc_name):
         cls.exc_name = exc_name
     
-    def forceReleaseComponent(self, name):
+    def releaseComponent(self, name):
         pass
 
     def disconnect(self):
@@ -218,12 +223,7 @@ class MockComponent(object):
         self.name = name
         self.container = container
         self.startup_delay = int(startup_delay)
-        startup_time = datetime.utcnow() + timedelta(seconds=self.startup_delay)
-        r = redis.StrictRedis()
-        r.set(
-            '__%s/startup_time' % self.name,
-            startup_time.strftime(dt_format),
-        )
+        states.start(self.name, self.startup_delay)
         for property_ in MockComponent.properties.items():
             self.set_property(*property_)
 
@@ -294,6 +294,9 @@ class MockComponent(object):
     def _get_name(self):
         return self.name
 
+    def monitor(self, attribute, callback, timer, delta=None):
+        return MockMonitor(self, attribute, callback, timer, delta)
+
 
 class Property(object):
     def __init__(self, name, value, completion):
@@ -317,6 +320,42 @@ class Property(object):
             return self
 
 
+class MockMonitor(object):
+    """Fake BACI monitor: push the property value every timer seconds,
+    or when it changes more than delta"""
+
+    def __init__(self, component, attribute, callback, timer, delta=None):
+        self.component = component
+        self.attribute = attribute
+        self.callback = callback
+        self.timer = timer
+        self.delta = delta
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self):
+        last_value, last_push = None, 0
+        while not self.stop.is_set():
+            try:
+                property_ = getattr(self.component, '_get_%s' % self.attribute)
+                value, completion = property_().get_sync()
+            except CannotGetComponentError:
+                break  # The component has gone away: stop pushing
+            changed = (
+                self.delta is not None and last_value is not None
+                and abs(value - last_value) > self.delta
+            )
+            if changed or time.time() - last_push >= self.timer:
+                self.callback(value, completion.timeStamp)
+                last_value, last_push = value, time.time()
+            self.stop.wait(0.01)
+
+    def destroy(self):
+        self.stop.set()
+
+
 class Completion(object):
     def __init__(self, code=0, timestamp=138129971470735140L):
         self.code = code
@@ -394,6 +433,19 @@ def redis_client(request):
     return r
 
 
+@pytest.fixture()
+def store(redis_client):
+    """Write an attribute to redis, as the publisher does"""
+
+    def store_attribute(key, data):
+        pipe = redis_client.pipeline()
+        register([key], pipe)
+        publish(pipe, key, data, {})
+        pipe.execute()
+
+    return store_attribute
+
+
 @pytest.fixture()
 def scheduler(request):
     executors = {
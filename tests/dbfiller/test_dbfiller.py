@@ -13,57 +13,56 @@ attribute = dict(
 )
 
 
-
-def test_key_starts_unserscore(client, dbfiller, redis_client):
+def test_key_starts_unserscore(client, dbfiller, redis_client, store):
     """Do not add a key if it starts with underscore"""
     key = '__SYSTEM/Component/name'
     attribute['timestamp'] = datetime.utcnow().strftime(dt_format)
-    redis_client.hmset(key, attribute)
+    store(key, attribute)
     redis_client.set('__dbfiller_stop', 'yes')
     dbfiller.dbfiller()
     result = Attribute.query.filter(Attribute.name == key).all()
     assert not result
 
 
-def test_colon_in_key(client, dbfiller, redis_client):
+def test_colon_in_key(client, dbfiller, redis_client, store):
     """Do not add the attribute if the key contains :"""
     key = 'SYSTEM/Component/name:'
     attribute['timestamp'] = datetime.utcnow().strftime(dt_format)
-    redis_client.hmset(key, attribute)
+    store(key, attribute)
     redis_client.set('__dbfiller_stop', 'yes')
     dbfiller.dbfiller()
     result = Attribute.query.filter(Attribute.name == key).all()
     assert not result
 
 
-def test_healthy_job_in_key(client, dbfiller, redis_client):
+def test_healthy_job_in_key(client, dbfiller, redis_client, store):
     """Do not add the attribute if the key contains `healthy_job`"""
     key = 'healthy_job_something'
     attribute['timestamp'] = datetime.utcnow().strftime(dt_format)
-    redis_client.hmset(key, attribute)
+    store(key, attribute)
     redis_client.set('__dbfiller_stop', 'yes')
     dbfiller.dbfiller()
     result = Attribute.query.filter(Attribute.name == key).all()
     assert not result
 
 
-def test_three_slash_characters_in_key(client, dbfiller, redis_client):
+def test_three_slash_characters_in_key(client, dbfiller, redis_client, store):
     """Do not add the attribute if the key does not contains exactly two /"""
     key = 'SYSTEM/Component/name/foo'
     attribute['timestamp'] = datetime.utcnow().strftime(dt_format)
-    redis_client.hmset(key, attribute)
+    store(key, attribute)
     redis_client.set('__dbfiller_stop', 'yes')
     dbfiller.dbfiller()
     result = Attribute.query.filter(Attribute.name == key).all()
     assert not result
 
 
-def test_do_not_store_errors(client, dbfiller, redis_client):
+def test_do_not_store_errors(client, dbfiller, redis_client, store):
     """Do not add a key in case the attribute contains an error"""
     key = 'SYSTEM/Component/name'
     attribute['timestamp'] = datetime.utcnow().strftime(dt_format)
     attribute['error'] = 'an error message'
-    redis_client.hmset(key, attribute)
+    store(key, attribute)
     redis_client.set('__dbfiller_stop', 'yes')
     dbfiller.dbfiller()
     result = Attribute.query.filter(Attribute.name == key).all()
@@ -71,11 +70,22 @@ def test_do_not_store_errors(client, dbfiller, redis_client):
     attribute['error'] = ''
 
 
-def test_no_timestamp_in_data(client, dbfiller, redis_client):
+def test_no_timestamp_in_data(client, dbfiller, redis_client, store):
     """The job does not brake in case there is no timestamp"""
     key = 'SYSTEM/Component/name'
     if 'timestamp' in attribute:
         del attribute['timestamp']
+    store(key, attribute)
+    redis_client.set('__dbfiller_stop', 'yes')
+    dbfiller.dbfiller()
+    result = Attribute.query.filter(Attribute.name == key).all()
+    assert not result
+
+
+def test_unregistered_key(client, dbfiller, redis_client):
+    """Do not add the keys not published by the publisher"""
+    key = 'SYSTEM/Component/name'
+    attribute['timestamp'] = datetime.utcnow().strftime(dt_format)
     redis_client.hmset(key, attribute)
     redis_client.set('__dbfiller_stop', 'yes')
     dbfiller.dbfiller()
@@ -83,22 +93,22 @@ def test_no_timestamp_in_data(client, dbfiller, redis_client):
     assert not result
 
 
-def test_store_attribute(client, dbfiller, redis_client):
+def test_store_attribute(client, dbfiller, redis_client, store):
     """Store the attribute to db"""
     key = 'SYSTEM/Component/name'
     attribute['timestamp'] = datetime.utcnow().strftime(dt_format)
-    redis_client.hmset(key, attribute)
+    store(key, attribute)
     redis_client.set('__dbfiller_stop', 'yes')
     dbfiller.dbfiller()
     result = Attribute.query.filter(Attribute.name == key).first()
     assert result.timer == attribute['timer']
 
 
-def test_store_attribute_by_process(client, dbfiller, redis_client):
+def test_store_attribute_by_process(client, dbfiller, redis_client, store):
     """Start the process and verify it stores only one attribute"""
     key = 'SYSTEM/Component/name'
     attribute['timestamp'] = datetime.utcnow().strftime(dt_format)
-    redis_client.hmset(key, attribute)
+    store(key, attribute)
     dbfiller.start()
     # Wait a little bit, to be sure the process has the
     # chance to store more than one attribute
@@ -111,5 +121,21 @@ def test_store_attribute_by_process(client, dbfiller, redis_client):
     assert dbattr.timer == attribute['timer']
 
 
+def test_recent_values(client, dbfiller, redis_client, store):
+    """The stored values are also kept in Redis, the same as in the db"""
+    from suricate.dbfiller import recent_values
+    key = 'SYSTEM/Component/name'
+    for i in range(3):
+        attribute['timestamp'] = datetime.utcnow().strftime(dt_format)
+        store(key, attribute)
+        redis_client.set('__dbfiller_stop', 'yes')
+        dbfiller.dbfiller()
+    query = Attribute.query.filter(Attribute.name == key)
+    stored = query.order_by(Attribute.timestamp.desc()).all()
+    assert recent_values(key, 3) == [a.serialize for a in stored]
+    assert recent_values(key, 2) == [a.serialize for a in stored[:2]]
+    assert recent_values(key, 4) is None  # Not enough values
+
+
 if __name__ == '__main__':
     pytest.main()
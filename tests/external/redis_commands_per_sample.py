@@ -0,0 +1,99 @@
+"""Count the Redis commands and round trips of every published sample.
+
+This is not an automatic test. It calls `acs_publisher()` on a fake
+component, in order to measure the Redis load of the success path:
+
+   $ python redis_commands_per_sample.py -n 1000
+
+Measured on the success path of a property, component already online:
+
+   - one command per round trip: 6 commands and 6 round trips per sample
+     (up to 10 when the component status changes)
+   - pipelined writes: 9 commands (MULTI and EXEC included) and 1 round
+     trip per sample
+   - component states kept in memory: 5 commands (MULTI and EXEC
+     included) and 1 round trip per sample
+   - no more healthy_job keys: 4 commands (MULTI, HMSET, PUBLISH and
+     EXEC) and 1 round trip per sample
+   - the Redis history (SCHEDULER history_maxlen) adds an XADD per sample,
+     and the channels are added to the DBFiller set only when their jobs
+     are created, not at every sample
+"""
+from __future__ import print_function
+import argparse
+import time
+
+import redis
+
+from suricate.monitor.jobs import acs_publisher
+from suricate.monitor.states import states
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    '-n',
+    '--samples',
+    type=int,
+    default=1000,
+    help='Number of samples to publish'
+)
+args = parser.parse_args()
+
+
+class Completion(object):
+    timeStamp = 138129971470735140
+
+
+class Property(object):
+
+    def get_sync(self):
+        return 1.0, Completion()
+
+
+class FakeComponent(object):
+
+    unavailables = []
+
+    def __init__(self, name):
+        self.name = name
+        states.start(self.name, 0)
+
+    def _get_position(self):
+        return Property()
+
+
+round_trips = [0]
+send_packed_command = redis.connection.Connection.send_packed_command
+
+
+def counted_send_packed_command(self, *args, **kwargs):
+    round_trips[0] += 1
+    return send_packed_command(self, *args, **kwargs)
+
+
+def total_commands(r):
+    stats = r.info('commandstats')
+    return sum(item['calls'] for item in stats.values())
+
+
+if __name__ == '__main__':
+    r = redis.StrictRedis()
+    component = FakeComponent('TestNamespace/Benchmark')
+    channel = '%s/position' % component.name
+    # Warm up: the first sample makes the component available
+    acs_publisher(channel, component, 'position', 0.1)
+
+    commands_before = total_commands(r)
+    redis.connection.Connection.send_packed_command = counted_send_packed_command
+    t0 = time.time()
+    for i in range(args.samples):
+        acs_publisher(channel, component, 'position', 0.1)
+    elapsed = time.time() - t0
+    redis.connection.Connection.send_packed_command = send_packed_command
+    # The INFO command itself counts as one command
+    commands = total_commands(r) - commands_before - 1
+
+    print('Samples: ', args.samples)
+    print('Redis commands per sample: %.2f' % (float(commands) / args.samples))
+    print('Round trips per sample: %.2f' % (float(round_trips[0]) / args.samples))
+    print('Microseconds per sample: %.1f' % (elapsed * 10**6 / args.samples))
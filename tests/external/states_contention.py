@@ -0,0 +1,120 @@
+"""Measure the contention of the component state transitions.
+
+This is not an automatic test.  Every thread owns a component and
+toggles its availability and error message, writing to Redis without a
+pipeline, as Component and the rescheduler do.  The `--latency` option
+adds a delay to every Redis write, as a remote Redis server (or the
+container check of Component) does:
+
+   $ python states_contention.py -t 16 -n 200 --latency 1
+   $ python states_contention.py -t 16 -n 200 --latency 1 --global-lock
+
+The `--global-lock` option runs the same transitions with a single
+process-wide lock, as the old `suricate.services.logging_lock` did.
+
+Measured with 16 threads and a local Redis server:
+
+   - no latency: 6000-10000 transitions per second in both cases, the
+     interpreter lock is the bottleneck
+   - 1 ms latency, global lock: 350 transitions per second, every
+     thread waits for the round trips of all the others
+   - 1 ms latency, per-component locks: 6000 transitions per second,
+     the round trips of different components overlap
+"""
+from __future__ import print_function
+import argparse
+import threading
+import time
+
+import redis
+
+from suricate.monitor.states import ComponentStates
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    '-t',
+    '--threads',
+    type=int,
+    default=16,
+    help='Number of threads, one component each'
+)
+parser.add_argument(
+    '-n',
+    '--transitions',
+    type=int,
+    default=500,
+    help='Number of transitions of every component'
+)
+parser.add_argument(
+    '--latency',
+    type=float,
+    default=0,
+    help='Milliseconds added to every Redis write'
+)
+parser.add_argument(
+    '--global-lock',
+    action='store_true',
+    help='Share a single lock among all the components'
+)
+args = parser.parse_args()
+
+
+class GlobalLockStates(ComponentStates):
+
+    def __init__(self):
+        super(GlobalLockStates, self).__init__()
+        self.global_lock = threading.RLock()
+
+    def lock(self, name):
+        return self.global_lock
+
+
+class SlowRedis(object):
+    """Delay the Redis writes by `latency` seconds."""
+
+    def __init__(self, latency):
+        self.r = redis.StrictRedis()
+        self.latency = latency
+
+    def __getattr__(self, name):
+        command = getattr(self.r, name)
+
+        def delayed(*args, **kwargs):
+            time.sleep(self.latency)
+            return command(*args, **kwargs)
+        return delayed
+
+
+def transitions(states, name, n, r):
+    key = '__%s/error' % name
+    for i in range(n):
+        available = bool(i % 2)
+        states.set_available(name, available, r)
+        if available:
+            states.clear_message(key, r)
+        else:
+            states.set_message(key, 'cannot get component %s' % name, r)
+
+
+if __name__ == '__main__':
+    states = GlobalLockStates() if args.global_lock else ComponentStates()
+    r = SlowRedis(args.latency / 1000.0)
+    threads = [
+        threading.Thread(
+            target=transitions,
+            args=(states, 'TestNamespace/Bench%02d' % i, args.transitions, r))
+        for i in range(args.threads)
+    ]
+    t0 = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - t0
+    total = args.threads * args.transitions
+
+    print('Lock: ', 'global' if args.global_lock else 'per component')
+    print('Threads: ', args.threads)
+    print('Latency (ms): ', args.latency)
+    print('Transitions per second: %.0f' % (total / elapsed))
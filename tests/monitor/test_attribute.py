@@ -1,6 +1,8 @@
 import time
 import json
+import threading
 import pytest
+from datetime import datetime
 
 from suricate.configuration import config
 
@@ -160,5 +162,229 @@ def test_set_property_value(component, scheduler, pubsub):
     assert msg['timestamp']
 
 
+def test_component_job(component, scheduler, pubsub, redis_client):
+    """A component job publishes every attribute to its own channel"""
+    component.setPosition(3)
+    job = scheduler.add_component_job(
+        component,
+        [('position', 'mm', 'current position'), ('current', '', '')],
+        timer=0.01
+    )
+    scheduler.wait_until_executed(job)
+    message = pubsub.get_data_message(channel='*position')
+    prop = json.loads(message['data'])
+    assert message['channel'] == '%s/position' % component.name
+    assert float(prop['value']) == 3.0
+    assert prop['units'] == 'mm'
+    time.sleep(0.1)
+    key = '%s/current' % component.name
+    assert redis_client.hget(key, 'error') == ''
+    assert float(redis_client.hget(key, 'value')) == 1.0
+
+
+def test_single_round_trip(component, redis_client, monkeypatch):
+    """A successful sample is written to redis in one round trip"""
+    import redis
+    from suricate.monitor.jobs import acs_publisher
+    channel = '%s/position' % component.name
+    acs_publisher(channel, component, 'position', 0.1)  # Component online
+    round_trips = []
+    send_packed_command = redis.connection.Connection.send_packed_command
+    def counted_send_packed_command(self, *args, **kwargs):
+        round_trips.append(args)
+        return send_packed_command(self, *args, **kwargs)
+    monkeypatch.setattr(
+        redis.connection.Connection,
+        'send_packed_command',
+        counted_send_packed_command
+    )
+    acs_publisher(channel, component, 'position', 0.1)
+    assert len(round_trips) == 1
+    assert redis_client.hget(channel, 'error') == ''
+    assert redis_client.hget('components', component.name) == 'available'
+
+
+def test_deadband(component, redis_client, monkeypatch):
+    """A value within the deadband is published only on heartbeat"""
+    from suricate.monitor import jobs
+    channel = '%s/position' % component.name
+    options = {'deadband': 0.5, 'heartbeat': 0.3}
+    attributes = [(channel, 'position', '', '', options)]
+    values = iter([1.0, 1.2, 1.4, 1.7, 1.8, 1.8])
+    monkeypatch.setattr(
+        jobs,
+        'read_attribute',
+        lambda c, a: (next(values), datetime.utcnow())
+    )
+    published = []
+    for i in range(5):
+        jobs.acs_batch_publisher(channel, component, attributes, 0.1)
+        published.append(redis_client.hget(channel, 'value'))
+    assert published == ['1.0', '1.0', '1.0', '1.7', '1.7']
+    time.sleep(0.3)  # Heartbeat
+    jobs.acs_batch_publisher(channel, component, attributes, 0.1)
+    assert redis_client.hget(channel, 'value') == '1.8'
+
+
+def test_deadband_relative():
+    from suricate.monitor.jobs import within_deadband
+    options = {'deadband': 0.1, 'deadband_type': 'relative'}
+    assert not within_deadband('test/relative', (10, 'a'), options)
+    assert within_deadband('test/relative', (10.9, 'a'), options)
+    assert not within_deadband('test/relative', (10.9, 'b'), options)
+    assert not within_deadband('test/relative', (11.1, 'a'), options)
+
+
+def test_typed_value(component, redis_client, pubsub):
+    """A typed attribute keeps the type of its value"""
+    from suricate.monitor.jobs import acs_batch_publisher
+    channel = '%s/seq' % component.name
+    attributes = [(channel, 'seq', '', '', {'typed': True})]
+    pubsub.psubscribe('%s:typed' % channel)
+    acs_batch_publisher(channel, component, attributes, 0.1)
+    message = pubsub.get_data_message(channel='%s:typed' % channel)
+    data = json.loads(message['data'])
+    assert data['type'] == 'float[]'
+    assert data['value'] == [1.1, 2.3, 3.3]
+    assert redis_client.hget(channel, 'type') == 'float[]'
+    assert json.loads(redis_client.hget(channel, 'typed_value')) == [1.1, 2.3, 3.3]
+    assert redis_client.hget(channel, 'value') == '(1.1, 2.3, 3.3)'
+
+
+def test_register_channels(component, scheduler, redis_client):
+    """The channels are added to the DBFiller set by their jobs, once"""
+    from suricate.monitor.jobs import publish
+    scheduler.add_component_job(component, [('position', 'mm', '')], 0.01)
+    channel = '%s/position' % component.name
+    assert redis_client.smembers('attributes') == {channel}
+    redis_client.delete('attributes')
+    pipe = redis_client.pipeline()
+    publish(pipe, channel, {'value': '1', 'error': '', 'timestamp': ''}, {})
+    pipe.execute()
+    assert not redis_client.exists('attributes')
+
+def test_encode_value():
+    from suricate.monitor.jobs import encode_value
+    assert encode_value(True) == ('bool', True)
+    assert encode_value(3L) == ('int', 3)
+    assert encode_value((1, 2)) == ('int[]', [1, 2])
+    assert encode_value((1, 'a')) == ('list', [1, 'a'])
+    assert encode_value(object)[0] == 'str'
+
+
+def test_binary_wire_format(component, pubsub, redis_client, monkeypatch):
+    """The binary messages are published on the <channel>:bin channel"""
+    pytest.importorskip('msgpack')
+    from suricate.wire import decode
+    from suricate.monitor.jobs import acs_batch_publisher
+    monkeypatch.setitem(config['SCHEDULER'], 'wire_format', 'json+binary')
+    channel = '%s/seq' % component.name
+    attributes = [(channel, 'seq', 'mm', 'sequence', {})]
+    pubsub.psubscribe('%s:bin' % channel)
+    acs_batch_publisher(channel, component, attributes, 0.1)
+    message = pubsub.get_data_message(channel='%s:bin' % channel)
+    data = decode(message['data'])
+    assert data['type'] == 'float[]'
+    assert data['value'] == [1.1, 2.3, 3.3]
+    assert data['error'] == ''
+    json_message = json.dumps(redis_client.hgetall(channel))
+    assert len(message['data']) < len(json_message)
+
+
+def test_read_timeout(component, redis_client):
+    """A hung read gives an error sample and frees the job"""
+    from suricate.monitor.breakers import throttles
+    from suricate.monitor.jobs import acs_batch_publisher, get_reader
+    release = threading.Event()
+    property_ = getattr(component, '_get_position')
+    get_sync = property_.get_sync
+    property_.get_sync = lambda: release.wait() or get_sync()
+    channel = '%s/position' % component.name
+    attributes = [(channel, 'position', '', '', {'timeout': 0.2})]
+    try:
+        max_reads = get_reader().max_reads
+        for i in range(max_reads):
+            throttles.clear()  # Do not wait for the backoff
+            t0 = time.time()
+            acs_batch_publisher(channel, component, attributes, 0.1)
+            assert time.time() - t0 < 1
+            error = redis_client.hget(channel, 'error')
+            assert error == 'timeout reading position from %s' % component.name
+        # The component has too many hung reads
+        throttles.clear()
+        acs_batch_publisher(channel, component, attributes, 0.1)
+        error = redis_client.hget(channel, 'error')
+        assert error == 'too many hung reads from %s' % component.name
+    finally:
+        release.set()
+    time.sleep(0.1)
+    assert get_reader().hung[component.name] == 0
+
+
+def test_throttle_failing_attribute(component, redis_client):
+    """A hung attribute does not stop the other ones of its batch"""
+    from suricate.monitor.jobs import acs_batch_publisher
+    release = threading.Event()
+    reads = []
+    property_ = getattr(component, '_get_position')
+    get_sync = property_.get_sync
+
+    def hung_get_sync():
+        reads.append(1)
+        release.wait()
+        return get_sync()
+
+    property_.get_sync = hung_get_sync
+    name = component.name
+    attributes = [
+        ('%s/position' % name, 'position', '', '', {'timeout': 0.2}),
+        ('%s/current' % name, 'current', '', '', {}),
+    ]
+    try:
+        for i in range(3):
+            acs_batch_publisher('%s@0.1' % name, component, attributes, 0.1)
+            error = redis_client.hget('%s/position' % name, 'error')
+            assert error == 'timeout reading position from %s' % name
+            assert redis_client.hget('%s/current' % name, 'error') == ''
+            assert redis_client.hget('components', name) == 'available'
+        assert len(reads) == 1  # Not read again until its backoff elapses
+    finally:
+        release.set()
+
+
+def test_max_running_reads(component):
+    """A stuck component does not take more than max_reads threads"""
+    from suricate.monitor.jobs import AttributeReader
+    release = threading.Event()
+    lock = threading.Lock()
+    running = []
+    property_ = getattr(component, '_get_position')
+    get_sync = property_.get_sync
+
+    def hung_get_sync():
+        with lock:
+            running.append(1)
+        release.wait()
+        return get_sync()
+
+    property_.get_sync = hung_get_sync
+    reader = AttributeReader(max_workers=20, max_reads=4)
+    try:
+        futures = [reader.submit(component, 'position') for i in range(10)]
+        time.sleep(0.2)
+        assert len(running) == 4
+        # The abandoned reads still in the queue do not run
+        reader.abandon(component.name, futures[-1])
+        assert futures[-1].cancelled()
+    finally:
+        release.set()
+    for future in futures[:-1]:
+        value, t = future.result(1)
+    assert len(running) == 9
+    time.sleep(0.1)
+    assert reader.running[component.name] == 0
+    assert reader.hung[component.name] == 0
+
+
 if __name__ == '__main__':
     pytest.main()
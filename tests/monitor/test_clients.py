@@ -0,0 +1,80 @@
+import pytest
+
+from suricate.clients import ClientPool
+
+
+class FakeClient(object):
+
+    instances = []
+
+    def __init__(self, client_name):
+        self.name = client_name
+        self.exc_name = ''
+        self.released = []
+        self.disconnected = False
+        FakeClient.instances.append(self)
+
+    def getComponent(self, name):
+        if self.exc_name:
+            raise type(self.exc_name, (Exception,), {})()
+        return object()
+
+    def releaseComponent(self, name):
+        self.released.append(name)
+
+    def disconnect(self):
+        self.disconnected = True
+
+
+@pytest.fixture()
+def pool(monkeypatch):
+    FakeClient.instances = []
+    monkeypatch.setattr('suricate.services.get_client_class', lambda: FakeClient)
+    return ClientPool(size=2)
+
+
+def test_shared_clients(pool):
+    """Many components share the clients of the pool"""
+    names = ['TestNamespace/Positioner%02d' % i for i in range(10)]
+    for name in names:
+        pool.get_component(name)
+    assert len(FakeClient.instances) == 2
+    assert pool.get_client(names[0]) is pool.get_client(names[0])
+    stats = pool.stats()
+    assert stats['clients'] == 2
+    assert stats['connections'] == 2
+    assert stats['references'] == 10
+    assert stats['misses'] == 10
+
+
+def test_cached_references(pool):
+    name = 'TestNamespace/Positioner00'
+    reference = pool.get_component(name)
+    assert pool.get_component(name) is reference
+    assert pool.stats()['hits'] == 1
+    pool.invalidate(name)
+    assert pool.get_client(name).released == []
+    reference = pool.get_component(name)
+    pool.release(name)
+    assert pool.get_client(name).released == [name]
+    assert pool.get_component(name) is not reference
+
+
+def test_lazy_reconnection(pool):
+    """A client that lost the manager is replaced by a new one"""
+    name = 'TestNamespace/Positioner00'
+    pool.get_component(name)
+    client = pool.get_client(name)
+    pool.invalidate(name)
+    client.exc_name = 'NoPermissionEx'
+    with pytest.raises(Exception):
+        pool.get_component(name)
+    assert client.disconnected
+    assert pool.stats()['clients'] == 0
+    pool.get_component(name)
+    assert pool.get_client(name) is not client
+    assert pool.stats()['disconnections'] == 1
+
+
+if __name__ == '__main__':
+    pytest.main()
@@ -20,6 +20,99 @@ def test_reload_component(Publisher, component, pubsub):
     assert not property_['error']  # Component available
 
 
+def test_circuit_breaker(Publisher, component, pubsub, redis_client):
+    """Pause all the jobs of a component, and resume them together"""
+    Publisher.add_errors_listener()
+    Publisher.s.add_component_job(component, [('position', '', '')], timer=0.1)
+    Publisher.s.add_component_job(component, [('current', '', '')], timer=0.2)
+    component.release()
+    Publisher.start()
+    time.sleep(0.5)
+    for channel in ('position', 'current'):
+        key = '%s/%s' % (component.name, channel)
+        assert redis_client.hget(key, 'error')
+    job_ids = ['%s@0.1' % component.name, '%s@0.2' % component.name]
+    for job_id in job_ids:
+        assert Publisher.s.get_job(job_id).next_run_time is None  # Paused
+    assert Publisher.s.get_job('probe:%s' % component.name)
+    time.sleep(config['SCHEDULER']['reschedule_error_interval'] * 1.3)
+    for job_id in job_ids:
+        assert Publisher.s.get_job(job_id).next_run_time is not None
+    for channel in ('*position', '*current'):
+        message = pubsub.get_data_message(channel=channel)
+        assert not json.loads(message['data'])['error']
+
+
+def test_attribute_error_keeps_batch(Publisher, component, pubsub, redis_client):
+    """A hung attribute does not stop the other attributes of its job"""
+    import threading
+    release = threading.Event()
+    property_ = getattr(component, '_get_position')
+    get_sync = property_.get_sync
+    property_.get_sync = lambda: release.wait() or get_sync()
+    Publisher.add_errors_listener()
+    Publisher.s.add_component_job(
+        component,
+        [('position', '', '', {'timeout': 0.05}), ('current', '', '')],
+        timer=0.1)
+    pubsub.psubscribe('%s/current' % component.name)
+    try:
+        Publisher.start()
+        messages = 0
+        t0 = time.time()
+        while time.time() - t0 < 1:
+            message = pubsub.get_data_message(channel='*current')
+            assert not json.loads(message['data'])['error']
+            messages += 1
+        assert messages >= 7
+        job = Publisher.s.get_job('%s@0.1' % component.name)
+        assert job.next_run_time is not None  # Not paused
+        assert not Publisher.s.get_job('probe:%s' % component.name)
+        key = '%s/position' % component.name
+        assert redis_client.hget(key, 'error').startswith('timeout reading')
+    finally:
+        release.set()
+
+
+def test_probe_gets_new_reference(Publisher, component):
+    """The probe does not take the cached reference of the component"""
+    from suricate.clients import get_pool
+    from suricate.monitor.breakers import breakers
+    pool = get_pool()
+    pool.references[component.name] = object()  # Broken reference
+    breakers.open(component, [])
+    Publisher.probe(component.name)
+    assert component.name not in pool.references
+    assert breakers.get(component.name) is None
+
+
+def test_probe_releases_nothing(Publisher, component, monkeypatch):
+    """A probe after an attribute timeout does not release the component"""
+    import threading
+    from suricate.clients import get_pool
+    from suricate.monitor.breakers import breakers
+    from suricate.monitor.jobs import acs_batch_publisher
+    pool = get_pool()
+    client = pool.get_client(component.name)
+    released = []
+    for method in ('releaseComponent', 'forceReleaseComponent'):
+        monkeypatch.setattr(client, method, released.append, raising=False)
+    pool.references[component.name] = object()
+    release = threading.Event()
+    property_ = getattr(component, '_get_position')
+    get_sync = property_.get_sync
+    property_.get_sync = lambda: release.wait() or get_sync()
+    channel = '%s/position' % component.name
+    try:
+        acs_batch_publisher(
+            channel, component, [(channel, 'position', '', '', {'timeout': 0.05})], 0.1)
+    finally:
+        release.set()
+    breakers.open(component, [])
+    Publisher.probe(component.name)
+    assert released == []
+
+
 def test_publish_error(Publisher, component, pubsub):
     Publisher.add_errors_listener()
     Publisher.s.add_attribute_job(component, 'wrong_property', timer=0.1)
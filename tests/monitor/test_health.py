@@ -0,0 +1,71 @@
+import json
+import time
+import pytest
+
+import suricate.services
+from suricate.services import HealthMonitor, is_container_online
+
+
+@pytest.fixture()
+def processes(monkeypatch):
+    """Fake process table, and number of calls of ps_output()"""
+    processes = {'lines': ['java maciManagerJ'], 'calls': 0}
+
+    def ps_output(keyword):
+        processes['calls'] += 1
+        return '\n'.join(l for l in processes['lines'] if keyword in l)
+
+    monkeypatch.setattr('suricate.services.ps_output', ps_output)
+    return processes
+
+
+@pytest.fixture()
+def health(request, redis_client):
+    redis_client.delete('health')
+    health = HealthMonitor()
+    request.addfinalizer(health.stop)
+    return health
+
+
+def test_transitions(processes, health, redis_client, pubsub):
+    health.watch('PositionerContainer')
+    pubsub.get_data_message(channel='health', timeout=0)  # Subscribe
+    health.start(0.05)
+    message = pubsub.get_data_message(channel='health')
+    assert json.loads(message['data']) == {'name': 'manager', 'online': True}
+    message = pubsub.get_data_message(channel='health')
+    assert json.loads(message['data']) == {
+        'name': 'container:PositionerContainer',
+        'online': False,
+    }
+    assert health.get('manager') is True
+    assert health.get('container:PositionerContainer') is False
+    assert redis_client.hget('health', 'manager') == 'online'
+    assert redis_client.hget('health', 'container:PositionerContainer') == 'offline'
+
+    processes['lines'].append('python StartContainer PositionerContainer')
+    message = pubsub.get_data_message(channel='health')
+    assert json.loads(message['data']) == {
+        'name': 'container:PositionerContainer',
+        'online': True,
+    }
+    assert health.get('container:PositionerContainer') is True
+    health.stop()
+    assert health.get('manager') is None  # Not running
+
+
+def test_cached_state(processes, health, monkeypatch):
+    """The callers read the state of the health monitor"""
+    monkeypatch.setattr('suricate.services.health', health)
+    processes['lines'].append('python StartContainer PositionerContainer')
+    assert is_container_online('PositionerContainer')  # Probed
+    health.start(10)
+    time.sleep(0.1)
+    calls = processes['calls']
+    for i in range(100):
+        assert is_container_online('PositionerContainer')
+    assert processes['calls'] == calls
+
+
+if __name__ == '__main__':
+    pytest.main()
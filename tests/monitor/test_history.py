@@ -0,0 +1,83 @@
+import time
+import pytest
+
+from suricate.configuration import config
+from suricate.monitor import history
+
+
+@pytest.fixture(autouse=True)
+def enable_history(monkeypatch):
+    monkeypatch.setitem(config['SCHEDULER'], 'history_maxlen', 1000)
+
+
+def append(redis_client, channel, samples):
+    pipe = redis_client.pipeline()
+    for i in range(samples):
+        history.append(pipe, channel, {'value': str(i), 'error': ''})
+    pipe.execute()
+
+
+def test_job_appends_samples(component, redis_client):
+    """Every sample of a job is appended to the attribute history"""
+    from suricate.monitor.jobs import acs_batch_publisher
+    channel = '%s/position' % component.name
+    attributes = [(channel, 'position', 'mm', 'position', {})]
+    for i in range(3):
+        acs_batch_publisher(channel, component, attributes, 0.1)
+    samples = history.read(channel)
+    assert len(samples) == 3
+    assert samples[0]['units'] == 'mm'
+    assert samples[0]['value'] == redis_client.hget(channel, 'value')
+    assert samples[0]['id'] > samples[1]['id'] > samples[2]['id']
+
+
+def test_read_last_samples(redis_client):
+    channel = 'SYSTEM/Component/name'
+    append(redis_client, channel, 5)
+    samples = history.read(channel, count=2)
+    assert [s['value'] for s in samples] == ['4', '3']
+    assert history.read('SYSTEM/Component/empty') == []
+
+
+def test_read_after(redis_client):
+    """A consumer gets every sample, without duplicates"""
+    channel = 'SYSTEM/Component/name'
+    append(redis_client, channel, 3)
+    samples = history.read_after(channel)
+    assert [s['value'] for s in samples] == ['0', '1', '2']
+    assert history.read_after(channel, samples[-1]['id']) == []
+    append(redis_client, channel, 2)
+    samples = history.read_after(channel, samples[-1]['id'])
+    assert [s['value'] for s in samples] == ['0', '1']
+
+
+def test_maxlen(redis_client, monkeypatch):
+    """The history keeps about history_maxlen samples"""
+    monkeypatch.setitem(config['SCHEDULER'], 'history_maxlen', 10)
+    channel = 'SYSTEM/Component/name'
+    append(redis_client, channel, 1000)
+    # The trimming is approximate: Redis removes whole nodes of samples
+    length = redis_client.xlen(history.history_key(channel))
+    assert 10 <= length <= 200
+
+
+def test_max_age(redis_client, monkeypatch):
+    """The history keeps about the samples of the last history_max_age"""
+    monkeypatch.setitem(config['SCHEDULER'], 'history_max_age', 0.1)
+    channel = 'SYSTEM/Component/name'
+    append(redis_client, channel, 1000)
+    time.sleep(0.2)
+    append(redis_client, channel, 1)
+    length = redis_client.xlen(history.history_key(channel))
+    assert 1 <= length <= 200
+
+
+def test_disabled(redis_client, monkeypatch):
+    monkeypatch.setitem(config['SCHEDULER'], 'history_maxlen', 0)
+    channel = 'SYSTEM/Component/name'
+    append(redis_client, channel, 3)
+    assert not redis_client.exists(history.history_key(channel))
+
+
+if __name__ == '__main__':
+    pytest.main()
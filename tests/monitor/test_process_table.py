@@ -0,0 +1,93 @@
+import os
+import time
+import pytest
+
+from suricate.services import ProcessTable, RemoteProcessTable
+
+
+def add_process(proc, pid, *args):
+    os.mkdir(os.path.join(proc, str(pid)))
+    with open(os.path.join(proc, str(pid), 'cmdline'), 'wb') as f:
+        f.write(b'\0'.join(args) + b'\0')
+
+
+@pytest.fixture()
+def proc(tmpdir):
+    proc = str(tmpdir)
+    os.mkdir(os.path.join(proc, 'self'))
+    add_process(proc, 1, b'/sbin/init')
+    add_process(proc, 100, b'java', b'-Dfoo', b'com.cosylab.acs.maci.manager.app.maciManagerJ')
+    add_process(proc, 200, b'python', b'StartContainer', b'PositionerContainer')
+    os.mkdir(os.path.join(proc, '300'))  # A kernel thread
+    open(os.path.join(proc, '300', 'cmdline'), 'wb').close()
+    return proc
+
+
+def test_grep(proc):
+    table = ProcessTable(ttl=10, proc=proc)
+    assert 'maciManagerJ' in table.grep('maciManager')
+    assert 'PositionerContainer' in table.grep('StartContainer')
+    assert table.grep('StartContainer') == 'python StartContainer PositionerContainer'
+    assert table.grep('NotRunning') == ''
+    assert len(table.commands) == 3
+
+
+def test_snapshot_ttl(proc):
+    """The snapshot is shared until it expires"""
+    table = ProcessTable(ttl=0.2, proc=proc)
+    assert 'MountContainer' not in table.grep('StartContainer')
+    add_process(proc, 201, b'python', b'StartContainer', b'MountContainer')
+    assert 'MountContainer' not in table.grep('StartContainer')
+    time.sleep(0.25)
+    assert 'MountContainer' in table.grep('StartContainer')
+
+
+def test_real_proc():
+    table = ProcessTable()
+    assert 'py' in table.grep('py')  # This python process
+
+
+@pytest.fixture()
+def remote(request):
+    """A local shell is the stand-in of the manager host session"""
+    table = RemoteProcessTable(command=['sh'], interval=0.1, stale=0.5, retry=0.5)
+    request.addfinalizer(table.close)
+    return table
+
+
+def test_remote_grep(remote):
+    assert 'pytest' in remote.grep('pytest')  # This process
+    process = remote.process
+    for i in range(5):
+        assert remote.grep('StartContainer') == ''
+        time.sleep(0.1)
+    assert remote.process is process  # Always the same session
+
+
+def test_remote_reconnection(remote):
+    remote.grep('pytest')
+    process = remote.process
+    process.kill()
+    time.sleep(0.6)  # The snapshot becomes stale
+    assert 'pytest' in remote.grep('pytest')
+    assert remote.process is not process
+
+
+def test_remote_stale(request):
+    """A session that stops sending the process table is an error"""
+    remote = RemoteProcessTable(command=['cat'], interval=0.1, stale=0.2, retry=0.5)
+    request.addfinalizer(remote.close)
+    with pytest.raises(IOError):
+        remote.grep('pytest')
+    started = remote.started
+    with pytest.raises(IOError):
+        remote.grep('pytest')
+    assert remote.started == started  # Do not retry too often
+    time.sleep(0.35)
+    with pytest.raises(IOError):
+        remote.grep('pytest')
+    assert remote.started > started
+
+
+if __name__ == '__main__':
+    pytest.main()
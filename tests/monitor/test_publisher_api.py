@@ -1,3 +1,4 @@
+import time
 import pytest
 import suricate.component
 
@@ -33,13 +34,60 @@ def test_one_argument_init(Publisher):
     publisher = Publisher(config)
     jobs_id = sorted([job.id for job in publisher.get_jobs()])
     assert jobs_id == [
-        'TestNamespace/Positioner00/current',
-        'TestNamespace/Positioner00/position',
-        'TestNamespace/Positioner01/getPosition',
+        'TestNamespace/Positioner00@0.1',
+        'TestNamespace/Positioner01@0.1',
         'rescheduler',
     ]
 
 
+def test_group_attributes_by_timer(Publisher):
+    """Attributes of a component sharing the same timer are sampled
+    by the same job"""
+    config = {
+        "TestNamespace/Positioner00": {
+            "startup_delay": 0,
+            "container": "PositionerContainer",
+            'properties': [
+                {"name": "position", "timer": 0.1},
+                {"name": "current", "timer": 0.2},
+                {"name": "seq", "timer": 0.1},
+            ],
+            'methods': [
+                {"name": "getPosition", "timer": 0.1},
+            ]
+        },
+    }
+    publisher = Publisher(config)
+    jobs = dict((job.id, job) for job in publisher.get_jobs())
+    assert sorted(jobs) == [
+        'TestNamespace/Positioner00@0.1',
+        'TestNamespace/Positioner00@0.2',
+        'rescheduler',
+    ]
+    job_id, component, attributes, timer = jobs['TestNamespace/Positioner00@0.1'].args
+    assert [item[1] for item in attributes] == [
+        'position',
+        'seq',
+        'getPosition',
+    ]
+    assert timer == 0.1
+    # A new attribute with the same timer is added to the existing job
+    publisher.add_jobs({
+        "TestNamespace/Positioner00": {
+            "startup_delay": 0,
+            "container": "PositionerContainer",
+            'methods': [{"name": "getSequence", "timer": 0.1}],
+        },
+    })
+    job = publisher.s.get_job('TestNamespace/Positioner00@0.1')
+    assert [item[1] for item in job.args[2]] == [
+        'position',
+        'seq',
+        'getPosition',
+        'getSequence',
+    ]
+
+
 def test_zero_arguments_init(Publisher):
     """In case of zero arguments there is only the rescheduler."""
     publisher = Publisher(1, 2, 3)
@@ -91,5 +139,29 @@ def test_wrong_property_name(Publisher, logger):
     assert 'Positioner has not property foo' in line
 
 
+def test_parallel_connection(Publisher, monkeypatch, logger):
+    """The components are connected concurrently at startup"""
+    connect = Publisher._connect
+
+    def slow_connect(*args):
+        time.sleep(0.5)
+        return connect(*args)
+
+    monkeypatch.setattr(Publisher, '_connect', staticmethod(slow_connect))
+    config = {}
+    for i in range(4):
+        config['TestNamespace/Positioner%02d' % i] = {
+            "startup_delay": 0,
+            "container": "PositionerContainer",
+            "properties": [{"name": "position", "timer": 0.1}]
+        }
+    t0 = time.time()
+    publisher = Publisher(config)
+    assert time.time() - t0 < 1.5
+    assert len(publisher.attribute_jobs()) == 4
+    line = open(logger.file_name).readline()
+    assert '4 components connected' in line
+
+
 if __name__ == '__main__':
     pytest.main()
@@ -0,0 +1,71 @@
+import time
+import json
+import pytest
+
+import suricate.component
+
+
+config = {
+    "TestNamespace/Positioner00": {
+        "startup_delay": 0,
+        "container": "PositionerContainer",
+        'properties': [
+            {"name": "position", "timer": 0.1, "mode": "push"},
+            {"name": "current", "timer": 0.1},
+        ],
+    },
+}
+
+
+def test_push_mode(Publisher, pubsub):
+    """The monitor publishes the attribute, without a polling job"""
+    publisher = Publisher(config)
+    publisher.start()
+    jobs = publisher.attribute_jobs()
+    assert {'id': 'TestNamespace/Positioner00/position', 'timer': 0.1} in jobs
+    jobs_id = sorted(job.id for job in publisher.get_jobs())
+    assert jobs_id == ['TestNamespace/Positioner00@0.1', 'rescheduler']
+    message = pubsub.get_data_message(channel='*position')
+    assert message['channel'] == 'TestNamespace/Positioner00/position'
+    data = json.loads(message['data'])
+    assert not data['error']
+    assert data['value'] == '0'
+
+
+def test_push_value_change(Publisher, pubsub):
+    """A change bigger than the deadband is pushed at once"""
+    timed_config = {'TestNamespace/Positioner00': dict(config['TestNamespace/Positioner00'])}
+    timed_config['TestNamespace/Positioner00']['properties'] = [
+        {"name": "position", "timer": 10, "mode": "push", "deadband": 5},
+    ]
+    pubsub.psubscribe('*position')
+    publisher = Publisher(timed_config)
+    publisher.start()
+    component = suricate.component.Component(
+        'TestNamespace/Positioner00', 'PositionerContainer', 0)
+    time.sleep(0.2)
+    component.setPosition(3)  # Within the deadband
+    component.setPosition(10)
+    message = pubsub.get_data_message(channel='*position')
+    data = json.loads(message['data'])
+    assert data['value'] == '0'
+    message = pubsub.get_data_message(channel='*position')
+    data = json.loads(message['data'])
+    assert data['value'] == '10'
+
+
+def test_restart_monitor(Publisher, pubsub):
+    """The rescheduler restarts the monitors that stop pushing values"""
+    publisher = Publisher(config)
+    publisher.start()
+    pusher = publisher.pushers['TestNamespace/Positioner00/position']
+    time.sleep(0.5)
+    assert pusher.is_alive()
+    pusher.component.release()  # The monitor stops pushing values
+    time.sleep(3.5)
+    assert pusher.is_alive()
+    assert not pusher.monitor.stop.is_set()
+
+
+if __name__ == '__main__':
+    pytest.main()
@@ -75,11 +75,12 @@ def test_startup_delay(Publisher, redis_client, logger):
         assert not message
 
         lines = open(logger.file_name).readlines()
-        assert len(lines) == 4
-        assert 'startup in progress' in lines[0]  # First component startup
-        assert 'startup in progress' in lines[1]  # Second component startup
-        assert 'is online' in lines[2]  # First component online
-        assert 'is online' in lines[3]  # Second component online
+        assert len(lines) == 5
+        assert 'components connected' in lines[0]  # Startup time
+        assert 'startup in progress' in lines[1]  # First component startup
+        assert 'startup in progress' in lines[2]  # Second component startup
+        assert 'is online' in lines[3]  # First component online
+        assert 'is online' in lines[4]  # Second component online
 
     finally:
         reload(configuration)
@@ -170,5 +171,128 @@ def test_some_components_not_active_at_startup(Publisher, redis_client):
         reload(configuration)
 
 
+def test_diff_reload(Publisher, redis_client):
+    """Reload changes only the jobs of the changed attributes"""
+    components = {
+        'TestNamespace/Positioner00': {
+            'startup_delay': 0,
+            'container': 'PositionerContainer',
+            'properties': [
+                {'name': 'position', 'timer': 0.1},
+                {'name': 'current', 'timer': 0.2},
+            ],
+        },
+        'TestNamespace/Positioner01': {
+            'startup_delay': 0,
+            'container': 'PositionerContainer',
+            'properties': [{'name': 'current', 'timer': 0.1}],
+        },
+    }
+    publisher = Publisher(components)
+    publisher.start()
+    time.sleep(0.5)
+    job = publisher.s.get_job('TestNamespace/Positioner00@0.1')
+    component = job.args[1]
+    assert redis_client.hget('components', 'TestNamespace/Positioner01')
+    redis_client.lpush('TestNamespace/Positioner01/current:recent', '{}')
+
+    components = {
+        'TestNamespace/Positioner00': {
+            'startup_delay': 0,
+            'container': 'PositionerContainer',
+            'properties': [
+                {'name': 'position', 'timer': 0.1},
+                {'name': 'current', 'timer': 0.1, 'units': 'A'},
+                {'name': 'seq', 'timer': 0.3},
+            ],
+        },
+        'TestNamespace/Positioner02': {
+            'startup_delay': 0,
+            'container': 'PositionerContainer',
+            'properties': [{'name': 'position', 'timer': 0.1}],
+        },
+    }
+    changes = publisher.reload(components)
+    assert sorted(changes['added']) == [
+        'TestNamespace/Positioner00/seq',
+        'TestNamespace/Positioner02/position',
+    ]
+    assert changes['removed'] == ['TestNamespace/Positioner01/current']
+    assert changes['modified'] == ['TestNamespace/Positioner00/current']
+    jobs = dict((j['id'], j['timer']) for j in publisher.attribute_jobs())
+    assert jobs == {
+        'TestNamespace/Positioner00/position': 0.1,
+        'TestNamespace/Positioner00/current': 0.1,
+        'TestNamespace/Positioner00/seq': 0.3,
+        'TestNamespace/Positioner02/position': 0.1,
+    }
+    # The component reference has been kept
+    job = publisher.s.get_job('TestNamespace/Positioner00@0.1')
+    assert job.args[1] is component
+    assert publisher.s.get_job('TestNamespace/Positioner00@0.2') is None
+    assert not redis_client.hget('components', 'TestNamespace/Positioner01')
+    assert not redis_client.exists('TestNamespace/Positioner01/current')
+    assert not redis_client.exists('TestNamespace/Positioner01/current:recent')
+    attributes = redis_client.smembers('attributes')
+    assert 'TestNamespace/Positioner01/current' not in attributes
+    assert 'TestNamespace/Positioner00/current' in attributes
+    time.sleep(0.5)
+    assert redis_client.hget('TestNamespace/Positioner00/current', 'units') == 'A'
+    assert redis_client.hget('TestNamespace/Positioner00/seq', 'value')
+    # Nothing changes, reloading the same configuration
+    changes = publisher.reload(components)
+    assert changes == {'added': [], 'removed': [], 'modified': []}
+    # An attribute removed from a running component loses its keys
+    components['TestNamespace/Positioner00']['properties'].pop()
+    redis_client.xadd('TestNamespace/Positioner00/seq:history', {'value': 1})
+    redis_client.lpush('TestNamespace/Positioner00/seq:recent', '{}')
+    changes = publisher.reload(components)
+    assert changes['removed'] == ['TestNamespace/Positioner00/seq']
+    assert not redis_client.exists('TestNamespace/Positioner00/seq')
+    assert not redis_client.exists('TestNamespace/Positioner00/seq:history')
+    assert not redis_client.exists('TestNamespace/Positioner00/seq:recent')
+    attributes = redis_client.smembers('attributes')
+    assert 'TestNamespace/Positioner00/seq' not in attributes
+    assert 'TestNamespace/Positioner00/seq' not in publisher.stats()
+
+
+def test_reload_waits_for_rescheduler(Publisher, monkeypatch):
+    """A reload does not interleave with the rescheduler adding jobs"""
+    import threading
+    components = {
+        'TestNamespace/Positioner00': {
+            'startup_delay': 0,
+            'container': 'PositionerContainer',
+            'properties': [{'name': 'position', 'timer': 0.1}],
+        },
+    }
+    publisher = Publisher()
+    connecting = threading.Event()
+    release = threading.Event()
+    connect = Publisher._connect
+
+    def slow_connect(*args):
+        connecting.set()
+        release.wait()
+        return connect(*args)
+
+    monkeypatch.setattr(Publisher, '_connect', staticmethod(slow_connect))
+    publisher.unavailable_components.update(components)
+    rescheduler = threading.Thread(target=publisher.rescheduler)
+    rescheduler.start()
+    try:
+        assert connecting.wait(1)
+        reload_ = threading.Thread(target=publisher.reload, args=({},))
+        reload_.start()
+        time.sleep(0.2)
+        assert reload_.is_alive()  # It waits for the rescheduler
+    finally:
+        release.set()
+    rescheduler.join(2)
+    reload_.join(2)
+    assert not publisher.attribute_jobs()
+    assert not publisher.unavailable_components
+
+
 if __name__ == '__main__':
     pytest.main()
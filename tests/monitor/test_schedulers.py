@@ -0,0 +1,200 @@
+import time
+import json
+import random
+import threading
+import pytest
+
+from apscheduler.util import datetime_to_utc_timestamp, utc_timestamp_to_datetime
+from suricate.monitor.schedulers import (
+    ACSScheduler,
+    ComponentPoolExecutor,
+    TimingWheelJobStore,
+    TimingWheelScheduler,
+)
+
+
+class Job(object):
+    """The TimingWheelJobStore only needs the job id and next_run_time"""
+
+    def __init__(self, id, timestamp):
+        self.id = id
+        self.next_run_time = utc_timestamp_to_datetime(timestamp)
+
+
+def test_wheel_due_jobs():
+    """Every job is due when its next run time has elapsed"""
+    store = TimingWheelJobStore(resolution=0.01, slots=8, levels=3)
+    t0 = time.time()
+    # Jobs in all the wheels and beyond the last one
+    offsets = [0.005, 0.05, 0.3, 2.5, 4, 7.3, 30, 100]
+    for i, offset in enumerate(offsets):
+        store.add_job(Job('job%d' % i, t0 + offset))
+    for i, offset in enumerate(offsets):
+        before = utc_timestamp_to_datetime(t0 + offset - 0.001)
+        after = utc_timestamp_to_datetime(t0 + offset)
+        assert 'job%d' % i not in [j.id for j in store.get_due_jobs(before)]
+        assert store.get_next_run_time() <= after
+        assert 'job%d' % i in [j.id for j in store.get_due_jobs(after)]
+        store.remove_job('job%d' % i)
+    assert not store.get_all_jobs()
+    assert store.get_next_run_time() is None
+
+
+def test_wheel_update_jobs():
+    store = TimingWheelJobStore(resolution=0.01, slots=8, levels=3)
+    t0 = time.time()
+    jobs = [Job('job%05d' % i, t0 + random.uniform(0, 20)) for i in range(10000)]
+    for job in jobs:
+        store.add_job(job)
+    assert [j.id for j in store.get_all_jobs()] == \
+        [j.id for j in sorted(jobs, key=lambda j: j.next_run_time)]
+    now = utc_timestamp_to_datetime(t0 + 10)
+    due_jobs = store.get_due_jobs(now)
+    assert len(due_jobs) == len([j for j in jobs if j.next_run_time <= now])
+    for job in due_jobs:  # Reschedule the due jobs
+        job.next_run_time = utc_timestamp_to_datetime(t0 + 30)
+        store.update_job(job)
+    assert not store.get_due_jobs(now)
+    later = utc_timestamp_to_datetime(t0 + 30)
+    assert len(store.get_due_jobs(later)) == 10000
+
+
+def test_timing_wheel_scheduler(component, pubsub):
+    s = TimingWheelScheduler()
+    s.start()
+    try:
+        job = s.add_attribute_job(component, 'position', timer=0.01)
+        message = pubsub.get_data_message(channel='*position')
+        assert message['channel'] == job.id
+        assert not json.loads(message['data'])['error']
+        s.reschedule_job(job.id, trigger='interval', seconds=0.02)
+        assert s.get_job(job.id).trigger.interval.microseconds == 20000
+    finally:
+        s.shutdown()
+
+
+def test_component_inflight_limit():
+    """A slow component can not have more than max_inflight running jobs"""
+    class SlowComponent(object):
+        name = 'TestNamespace/Slow'
+    running = []
+    max_running = []
+    lock = threading.Lock()
+
+    def read(channel, component):
+        with lock:
+            running.append(channel)
+            max_running.append(len(running))
+        time.sleep(0.2)
+        with lock:
+            running.remove(channel)
+
+    executor = ComponentPoolExecutor(max_workers=10, max_inflight=2)
+    s = ACSScheduler(executors={'default': executor})
+    s.start()
+    try:
+        for i in range(5):
+            s.add_job(
+                func=read,
+                args=('channel%d' % i, SlowComponent()),
+                trigger='interval',
+                seconds=0.01
+            )
+        time.sleep(1)
+        assert max(max_running) == 2
+    finally:
+        s.shutdown()
+    assert not executor.inflight
+    assert not executor.pending
+
+
+def test_component_runs_queued():
+    """The runs over the limit wait for their turn, they are not skipped"""
+    class SlowComponent(object):
+        name = 'TestNamespace/Slow'
+    ran = []
+
+    def read(channel, component):
+        ran.append(channel)
+        time.sleep(0.05)
+
+    executor = ComponentPoolExecutor(max_workers=10, max_inflight=1)
+    s = ACSScheduler(executors={'default': executor})
+    s.start()
+    try:
+        for i in range(3):
+            s.add_job(
+                func=read,
+                args=('channel%d' % i, SlowComponent()),
+                trigger='interval',
+                seconds=0.4
+            )
+        time.sleep(1)
+    finally:
+        s.shutdown()
+    for i in range(3):
+        assert ran.count('channel%d' % i) >= 2
+
+
+def test_remove_queued_job():
+    """The queued runs of a removed job do not run"""
+    class SlowComponent(object):
+        name = 'TestNamespace/Slow'
+    release = threading.Event()
+    ran = []
+
+    def read(channel, component):
+        ran.append(channel)
+        release.wait()
+
+    executor = ComponentPoolExecutor(max_workers=10, max_inflight=1)
+    s = ACSScheduler(executors={'default': executor})
+    s.start()
+    try:
+        for i in range(2):
+            s.add_job(
+                func=read,
+                args=('channel%d' % i, SlowComponent()),
+                id='channel%d' % i,
+                trigger='interval',
+                seconds=0.05
+            )
+        time.sleep(0.2)
+        queue = executor.pending[SlowComponent.name]
+        assert len(queue) == 1
+        job_id = queue[0][0].id
+        s.remove_job(job_id)
+        assert not queue
+        assert job_id not in executor._components
+        assert job_id not in executor._instances
+        release.set()
+        time.sleep(0.2)
+        assert job_id not in ran
+    finally:
+        release.set()
+        s.shutdown()
+
+
+def test_phase_spreading():
+    """The jobs sharing a timer start at stable and different offsets"""
+    s = ACSScheduler()
+    s.phase_groups['TestNamespace/Positioner02@2.0'] = 'group'
+    s.phase_groups['TestNamespace/Positioner03@2.0'] = 'group'
+    offsets = {}
+    for i in range(4):
+        job_id = 'TestNamespace/Positioner%02d@2.0' % i
+        trigger = s.interval_trigger(job_id, 2.0)
+        start = datetime_to_utc_timestamp(trigger.start_date)
+        offsets[job_id] = round(start % 2.0, 4)
+        # The offset does not depend on the time of the call
+        time.sleep(0.01)
+        start = datetime_to_utc_timestamp(s.interval_trigger(job_id, 2.0).start_date)
+        assert round(start % 2.0, 4) == offsets[job_id]
+    assert offsets['TestNamespace/Positioner00@2.0'] != \
+        offsets['TestNamespace/Positioner01@2.0']
+    assert offsets['TestNamespace/Positioner02@2.0'] == \
+        offsets['TestNamespace/Positioner03@2.0']
+
+
+if __name__ == '__main__':
+    pytest.main()
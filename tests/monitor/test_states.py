@@ -0,0 +1,54 @@
+import time
+import threading
+import pytest
+
+from suricate.monitor.states import ComponentStates
+
+
+def test_mirror_transitions(redis_client):
+    """The states are written to redis only when they change"""
+    states = ComponentStates()
+    pipe = redis_client.pipeline()
+    assert states.set_available('TestNamespace/Foo', True, pipe)
+    assert not states.set_available('TestNamespace/Foo', True, pipe)
+    assert states.set_message('__TestNamespace/Foo/error', 'error', pipe)
+    assert not states.set_message('__TestNamespace/Foo/error', 'error', pipe)
+    assert len(pipe) == 2
+    pipe.execute()
+    assert redis_client.hget('components', 'TestNamespace/Foo') == 'available'
+    assert redis_client.get('__TestNamespace/Foo/error') == 'error'
+    states.clear_message('__TestNamespace/Foo/error')
+    assert redis_client.get('__TestNamespace/Foo/error') is None
+    assert states.set_message('__TestNamespace/Foo/error', 'error')
+
+
+def test_startup(redis_client):
+    states = ComponentStates()
+    states.start('TestNamespace/Foo', 0.2)
+    assert redis_client.get('__TestNamespace/Foo/startup_time')
+    assert states.in_startup('TestNamespace/Foo')
+    assert not states.in_startup('TestNamespace/Bar')
+    time.sleep(0.25)
+    assert not states.in_startup('TestNamespace/Foo')
+
+
+def test_per_component_locks(redis_client):
+    """A busy component does not block the transitions of the others"""
+    states = ComponentStates()
+    assert states.lock('TestNamespace/Foo') is states.lock('TestNamespace/Foo')
+    done = threading.Event()
+
+    def transition():
+        states.set_available('TestNamespace/Bar', True)
+        states.set_message('__TestNamespace/Bar/error', 'error')
+        done.set()
+
+    with states.lock('TestNamespace/Foo'):
+        threading.Thread(target=transition).start()
+        assert done.wait(1)
+        # The lock is reentrant
+        assert states.set_available('TestNamespace/Foo', False)
+
+
+if __name__ == '__main__':
+    pytest.main()
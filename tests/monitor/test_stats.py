@@ -0,0 +1,54 @@
+import time
+import random
+import pytest
+
+from suricate.monitor.stats import Histogram, SamplingStats, summary
+
+
+def test_histogram_percentiles():
+    """The percentiles have a relative error less than ratio - 1"""
+    histogram = Histogram()
+    values = [random.uniform(0.001, 0.1) for i in range(10000)]
+    for value in values:
+        histogram.record(value)
+    values.sort()
+    for q in (0.5, 0.9, 0.99):
+        exact = values[int(q * len(values)) - 1]
+        estimate = histogram.percentile(q)
+        assert exact <= estimate <= exact * Histogram.ratio
+    assert histogram.peak == values[-1]
+    assert histogram.count() == 10000
+
+
+def test_summary():
+    stats = SamplingStats()
+    for i in range(10):
+        stats.record('TestNamespace/Positioner00/position', 'acs', 0.01)
+        stats.record('TestNamespace/Positioner01/position', 'acs', 0.02)
+    result = summary(stats.dump())
+    assert result['TestNamespace/Positioner00/position']['acs']['count'] == 10
+    assert result['*']['acs']['count'] == 20
+    assert result['*']['acs']['max'] == 0.02
+    assert 'redis' not in result['*']
+
+
+def test_publisher_stats(Publisher):
+    """The jobs record the lateness, the ACS and the Redis times"""
+    config = {
+        "TestNamespace/Positioner00": {
+            "startup_delay": 0,
+            "container": "PositionerContainer",
+            'properties': [{"name": "position", "timer": 0.1}],
+        },
+    }
+    publisher = Publisher(config)
+    publisher.start()
+    time.sleep(1)
+    dump = publisher.stats()
+    metrics = dump['TestNamespace/Positioner00/position']
+    assert set(metrics) == set(['lateness', 'acs', 'redis'])
+    assert summary(dump)['*']['lateness']['p50'] < 0.1
+
+
+if __name__ == '__main__':
+    pytest.main()
@@ -0,0 +1,122 @@
+import os
+import time
+import signal
+import threading
+import pytest
+
+from suricate.configuration import config
+from suricate.monitor.workers import PublisherPool, partition
+
+
+components = {
+    'TestNamespace/Positioner00': {
+        'startup_delay': 0,
+        'container': 'ContainerA',
+        'properties': [{'name': 'position', 'timer': 0.1}],
+    },
+    'TestNamespace/Positioner01': {
+        'startup_delay': 0,
+        'container': 'ContainerB',
+        'properties': [{'name': 'current', 'timer': 0.1}],
+    },
+    'TestNamespace/Positioner02': {
+        'startup_delay': 0,
+        'container': 'ContainerB',
+        'properties': [{'name': 'current', 'timer': 1}],
+    },
+}
+
+
+def test_partition_by_container():
+    """The components of a container stay in the same shard"""
+    shards = partition(components, 2, 'container')
+    assert len(shards) == 2
+    assert sorted(sorted(shard) for shard in shards) == [
+        ['TestNamespace/Positioner00'],
+        ['TestNamespace/Positioner01', 'TestNamespace/Positioner02'],
+    ]
+
+
+def test_partition_by_hash():
+    """The shard of a component does not depend on the other ones"""
+    shards = partition(components, 3, 'hash')
+    assert sum(len(shard) for shard in shards) == 3
+    first = [shard for shard in shards if 'TestNamespace/Positioner00' in shard]
+    subset = dict((k, v) for k, v in components.items() if k.endswith('00'))
+    assert partition(subset, 3, 'hash') == first
+
+
+def test_publisher_pool(redis_client):
+    pool = PublisherPool(components, 2, 'container')
+    pool.start()
+    try:
+        time.sleep(1)
+        for key in ('TestNamespace/Positioner00/position',
+                    'TestNamespace/Positioner01/current'):
+            assert redis_client.hget(key, 'error') == ''
+            assert redis_client.hget(key, 'value')
+        pool.add_jobs({
+            'TestNamespace/Positioner01': {
+                'startup_delay': 0,
+                'container': 'ContainerB',
+                'methods': [{'name': 'getPosition', 'timer': 0.1}],
+            }
+        })
+        expected = [
+            'TestNamespace/Positioner00/position',
+            'TestNamespace/Positioner01/current',
+            'TestNamespace/Positioner01/getPosition',
+            'TestNamespace/Positioner02/current',
+        ]
+        ids = [job['id'] for job in pool.attribute_jobs()]
+        assert sorted(i for i in ids if i != 'rescheduler') == expected
+        # A crashed worker is restarted with all its jobs
+        for process, connection in pool.workers:
+            process.terminate()
+            process.join()
+        time.sleep(config['SCHEDULER']['reschedule_interval'] * 2)
+        assert all(process.is_alive() for process, _ in pool.workers)
+        ids = [job['id'] for job in pool.attribute_jobs()]
+        assert sorted(i for i in ids if i != 'rescheduler') == expected
+    finally:
+        pool.shutdown()
+
+
+
+def test_request_to_stuck_worker(redis_client, monkeypatch):
+    """A worker that does not answer does not block the other ones"""
+    monkeypatch.setitem(config['SCHEDULER'], 'worker_timeout', 1)
+    pool = PublisherPool(components, 2, 'container')
+    pool.start()
+    try:
+        time.sleep(1)
+        stuck, _ = pool.workers[0]
+        os.kill(stuck.pid, signal.SIGSTOP)
+        try:
+            thread = threading.Thread(target=pool._request, args=(0, 'stats'))
+            thread.start()
+            time.sleep(0.1)
+            t0 = time.time()
+            assert pool._request(1, 'attribute_jobs')
+            assert time.time() - t0 < 0.5
+            thread.join()
+            t0 = time.time()
+            assert pool._request(0, 'attribute_jobs') == []
+            assert 1 <= time.time() - t0 < 2
+        finally:
+            os.kill(stuck.pid, signal.SIGCONT)
+        # The late answers are discarded
+        ids = [job['id'] for job in pool._request(0, 'attribute_jobs')]
+        assert ids
+        # A crashed worker does not make the requests wait
+        for process, connection in pool.workers:
+            process.terminate()
+            process.join()
+        t0 = time.time()
+        assert pool.attribute_jobs() == []
+        assert time.time() - t0 < 0.5
+    finally:
+        pool.shutdown()
+
+if __name__ == '__main__':
+    pytest.main()